@@ -0,0 +1,43 @@
+"""Benchmark promoting hot loops to generated code.
+
+Usage: python benchmarks/hot_loops.py [INPUT]
+
+Runs a program with nested loops (INPUT times around, default 100) with
+hot loops promoted as usual, and then with promotion turned off by
+raising `hot_loop_threshold` out of reach.
+"""
+
+import sys
+import time
+
+from mwot.brainfuck import interpreter
+from mwot.brainfuck.interpreter import Program
+
+# Input comes first, so there's no prefix to precompute.
+code = (b',[>' + b'+' * 40 + b'[>' + b'+' * 40 + b'[->+[>+<-]<]<-]<-]'
+        b'>>>.')
+
+
+def main(args):
+    data = bytes((int(args[0]) if args else 100,))
+
+    start = time.perf_counter()
+    promoted = Program(code).run(data)
+    tiered = time.perf_counter() - start
+
+    threshold = interpreter.hot_loop_threshold
+    interpreter.hot_loop_threshold = sys.maxsize
+    try:
+        start = time.perf_counter()
+        interpreted = Program(code).run(data)
+        plain = time.perf_counter() - start
+    finally:
+        interpreter.hot_loop_threshold = threshold
+    assert promoted == interpreted
+
+    print(f'interpreted: {plain:.3f} s')
+    print(f'promoted:    {tiered:.3f} s ({plain / tiered:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,46 @@
+"""Benchmark compiling MWOT straight to a brainfuck program.
+
+Usage: python benchmarks/mwot_programs.py [COPIES]
+
+Decompiles COPIES copies of the hello world program (default 20_000)
+into MWOT, then compiles it to a `Program` by way of brainfuck bytes,
+directly with `mwot_program()`, and again from its cache.
+"""
+
+import sys
+import time
+
+from mwot.brainfuck import from_bits, hello_world, to_bits
+from mwot.brainfuck import interpreter
+from mwot.compiler import bits_from_mwot
+from mwot.decompilers import rand
+
+
+def main(args):
+    copies = int(args[0]) if args else 20_000
+    code = b'[-]'.join([hello_world] * copies)
+    mwot = rand.decomp(to_bits(code)).join()
+
+    start = time.perf_counter()
+    brainfuck = from_bits(bits_from_mwot(mwot)).join()
+    program = interpreter.Program(brainfuck, shebang_in=False)
+    via_brainfuck = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fused = interpreter.mwot_program(mwot)
+    direct = time.perf_counter() - start
+    assert fused.hash == program.hash and fused.codes == program.codes
+
+    start = time.perf_counter()
+    assert interpreter.mwot_program(mwot) is fused
+    cached = time.perf_counter() - start
+
+    print(f'{len(mwot)} characters of MWOT, {len(program)} ops')
+    print(f'via brainfuck: {via_brainfuck:.3f} s')
+    print(f'direct:        {direct:.3f} s '
+          f'({via_brainfuck / direct:.1f}x faster)')
+    print(f'cached:        {cached:.3f} s')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+"""Benchmark compiling, saving and loading a big brainfuck program.
+
+Usage: python benchmarks/programs.py [COPIES]
+
+Builds a program from COPIES copies of the hello world program (with a
+comment loop between them), then reports how long it takes to compile,
+how much memory it holds, how big it is saved, and how long it takes to
+load again.
+"""
+
+import io
+import sys
+import time
+import tracemalloc
+
+from mwot.brainfuck import hello_world
+from mwot.brainfuck.interpreter import Program
+
+
+def main(args):
+    copies = int(args[0]) if args else 2_000
+    code = b'[-]'.join([hello_world] * copies)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    program = Program(code)
+    compiled = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    f = io.BytesIO()
+    program.save(f)
+    f.seek(0)
+    start = time.perf_counter()
+    loaded = Program.load(f)
+    load_time = time.perf_counter() - start
+    assert loaded.codes == program.codes
+
+    size = len(f.getvalue())
+    print(f'{len(code)} instructions, {len(program)} ops')
+    print(f'compile: {compiled:.3f} s, holding {held / (1 << 20):.1f} MiB '
+          f'({held / len(program):.1f} bytes per op)')
+    print(f'saved:   {size / (1 << 20):.1f} MiB')
+    print(f'load:    {load_time:.3f} s ({compiled / load_time:.0f}x faster)')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
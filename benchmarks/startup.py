@@ -0,0 +1,116 @@
+"""Benchmark `mwot` startup, as for a brainfuck script with a shebang.
+
+Usage: python benchmarks/startup.py [RUNS]
+
+Runs `mwot -xb` on a tiny script RUNS times (default 20), taking turns
+with a bare `python -c pass`, and prints the fastest and median times
+and the slowest imports from `python -X importtime -m mwot -xb`.
+
+The target, which exits with status 1 when it's missed:
+
+- None of `optional_modules` are imported. They only serve options
+  that weren't given.
+- The fastest `mwot -xb` run takes at most `max_ratio` times as long
+  as the fastest bare interpreter. (`-X importtime` doesn't list
+  modules loaded with `importlib.import_module()`, like the format
+  module, but the wall time includes them.)
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import mwot
+
+script = b'#!/usr/bin/env -S mwot -xb\n+.\n'
+max_ratio = 3.0
+optional_modules = [
+    'argparse',
+    'concurrent.futures',
+    'hashlib',
+    'json',
+    'queue',
+    'random',
+    'signal',
+    'socket',
+    'zlib',
+    'mwot.binary',
+    'mwot.brainfuck.metrics',
+    'mwot.brainfuck.minify',
+    'mwot.brainfuck.snapshot',
+    'mwot.cli.batch',
+    'mwot.cli.pipeline',
+    'mwot.cli.server',
+    'mwot.cli.timings',
+    'mwot.decompilers.basic',
+    'mwot.decompilers.dictionary',
+    'mwot.decompilers.guide',
+    'mwot.decompilers.rand',
+    'mwot.incremental',
+    'mwot.index',
+    'mwot.vectorized',
+]
+
+
+def timed_run(command, env):
+    start = time.perf_counter()
+    subprocess.run(command, env=env, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def import_times(command, env):
+    """Run with `-X importtime`: [(cumulative us, module), ...]."""
+    command = [command[0], '-X', 'importtime'] + command[1:]
+    stderr = subprocess.run(command, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, check=True).stderr
+    times = []
+    for line in stderr.decode().splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        times.append((int(cumulative), name.strip()))
+    return times
+
+
+def main(args):
+    runs = int(args[0]) if args else 20
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='')
+    env.pop('MWOT_SOCKET', None)
+    src = os.path.dirname(os.path.dirname(mwot.__file__))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [src] + env.get('PYTHONPATH', '').split(os.pathsep))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tiny.b')
+        with open(path, 'wb') as f:
+            f.write(script)
+        command = [sys.executable, '-m', 'mwot', '-xb', path]
+        bare = [sys.executable, '-c', 'pass']
+        imports = import_times(command, env)  # Also writes bytecode
+        times = {'python -c pass': [], 'mwot -xb': []}
+        for _ in range(runs):
+            times['python -c pass'].append(timed_run(bare, env))
+            times['mwot -xb'].append(timed_run(command, env))
+
+    for name, seconds in times.items():
+        print(f'{name + ":":16} {min(seconds) * 1000:6.1f} ms fastest, '
+              f'{statistics.median(seconds) * 1000:6.1f} ms median')
+    print('slowest imports (cumulative):')
+    for cumulative, name in sorted(imports, reverse=True)[:10]:
+        print(f'  {cumulative / 1000:6.1f} ms  {name}')
+
+    missed = False
+    imported = {name for _, name in imports}
+    extra = [name for name in optional_modules if name in imported]
+    if extra:
+        print(f'imported optional modules: {", ".join(extra)}')
+        missed = True
+    ratio = min(times['mwot -xb']) / min(times['python -c pass'])
+    print(f'{ratio:.2f}x a bare interpreter (target: <= {max_ratio}x)')
+    if ratio > max_ratio:
+        missed = True
+    return 1 if missed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
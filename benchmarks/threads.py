@@ -0,0 +1,45 @@
+"""Benchmark running one brainfuck program in many threads.
+
+Usage: python benchmarks/threads.py [RUNS [WORKERS]]
+
+Runs a CPU-bound program RUNS times, one after another and then with
+`run_parallel()`. With the GIL, the threaded time is about the same;
+on free-threaded Python, it should shrink with the number of cores.
+"""
+
+import os
+import sys
+import time
+
+from mwot.brainfuck.interpreter import Program, run_parallel
+
+# Loops (input byte) times; input comes first, so there's no prefix to
+# precompute.
+code = (b',[>' + b'+' * 40 + b'[>' + b'+' * 40 + b'[->+[>+<-]<]<-]<-]'
+        b'>>>.')
+
+
+def main(args):
+    runs = int(args[0]) if args else 16
+    workers = int(args[1]) if len(args) > 1 else os.cpu_count()
+    program = Program(code)
+    inputs = [bytes((20,))] * runs
+
+    start = time.perf_counter()
+    expected = [program.run(data) for data in inputs]
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    outputs = run_parallel(program, inputs, max_workers=workers)
+    threaded = time.perf_counter() - start
+    assert outputs == expected
+
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)
+    gil = 'enabled' if is_gil_enabled() else 'disabled'
+    print(f'{runs} runs, {workers} workers, GIL {gil}')
+    print(f'sequential: {sequential:.3f} s')
+    print(f'threaded:   {threaded:.3f} s ({sequential / threaded:.2f}x)')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
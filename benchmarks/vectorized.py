@@ -0,0 +1,60 @@
+"""Benchmark the NumPy compiler backend.
+
+Usage: python benchmarks/vectorized.py [CHARS]
+
+Compiles CHARS characters of random ASCII and non-ASCII text with and
+without NumPy. tests/test_vectorized.py checks that they agree.
+"""
+
+import random
+import sys
+import time
+
+from mwot import binary, compiler, util, vectorized
+
+# Letters, marks, digits, punctuation and whitespace, ASCII or not
+alphabets = {
+    'ascii': 'etaoinshrdlu ETAOIN 0123 .,!? \t\n\x1c',
+    'unicode': 'etaoin éßΩπжя漢字 ́٣   　\x85 .,!?\n',
+}
+
+
+def python_bits(text):
+    """Compile without NumPy."""
+    threshold = util.numpy_threshold
+    util.numpy_threshold = float('inf')
+    try:
+        return compiler.bits_from_mwot(text).join()
+    finally:
+        util.numpy_threshold = threshold
+
+
+def main(args):
+    chars = int(args[0]) if args else 1 << 22
+    random.seed(0)
+    for name, alphabet in alphabets.items():
+        text = ''.join(random.choices(alphabet, k=chars))
+
+        start = time.perf_counter()
+        expected = python_bits(text)
+        python = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bits = compiler.bits_from_mwot(text).join()
+        numpy = time.perf_counter() - start
+        assert bits == expected
+        bits = bits[:len(bits) // 8 * 8]  # Whole bytes
+
+        start = time.perf_counter()
+        data = binary.from_bits(bits).join()
+        packing = time.perf_counter() - start
+        assert data == vectorized.pack_bits(bits)
+
+        print(f'{name}: {chars} chars, {len(bits)} bits')
+        print(f'  python: {python:.3f} s')
+        print(f'  numpy:  {numpy:.3f} s ({python / numpy:.2f}x)')
+        print(f'  packing {len(data)} bytes: {packing:.3f} s')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -19,33 +19,56 @@ __all__ = [
 ]
 __version__ = '0.1.1'
 
-from . import binary
-from . import brainfuck
-from . import cli
-from . import decompilers
+import importlib
+
 from .compiler import bits_from_mwot
 from .join import joinable
 
-bf_from_bits = brainfuck.from_bits
-bits_from_bf = brainfuck.to_bits
-binary_from_bits = binary.from_bits
-bits_from_binary = binary.to_bits
+# Attributes loaded on first access, to keep `mwot` quick to start:
+# name -> (module, attribute or None for the module itself)
+_lazy = {
+    'binary': ('.binary', None),
+    'brainfuck': ('.brainfuck', None),
+    'cli': ('.cli', None),
+    'decompilers': ('.decompilers', None),
+    'bf_from_bits': ('.brainfuck', 'from_bits'),
+    'bits_from_bf': ('.brainfuck', 'to_bits'),
+    'binary_from_bits': ('.binary', 'from_bits'),
+    'bits_from_binary': ('.binary', 'to_bits'),
+    'run_bf': ('.brainfuck.interpreter', 'run'),
+    'run_bf_mwot': ('.brainfuck.interpreter', 'run_mwot'),
+    'decomp_basic': ('.decompilers.basic', 'decomp'),
+    'decomp_guide': ('.decompilers.guide', 'decomp'),
+    'decomp_rand': ('.decompilers.rand', 'decomp'),
+}
+
+
+def __getattr__(name):
+    try:
+        module_name, attr = _lazy[name]
+    except KeyError:
+        raise AttributeError(
+            f'module {__name__!r} has no attribute {name!r}') from None
+    value = importlib.import_module(module_name, __name__)
+    if attr is not None:
+        value = getattr(value, attr)
+    globals()[name] = value
+    return value
 
-run_bf = brainfuck.interpreter.run
-run_bf_mwot = brainfuck.interpreter.run_mwot
 
-decomp_basic = decompilers.basic.decomp
-decomp_guide = decompilers.guide.decomp
-decomp_rand = decompilers.rand.decomp
+def __dir__():
+    return sorted({*globals(), *_lazy})
 
 
 @joinable(bytes)
 def bf_from_mwot(mwot):
     """Convert MWOT source to brainfuck."""
-    return bf_from_bits(bits_from_mwot(mwot))
+    from .brainfuck import from_bits
+    return from_bits(bits_from_mwot(mwot))
 
 
 @joinable(bytes)
 def binary_from_mwot(mwot):
     """Convert MWOT source to binary."""
-    return binary_from_bits(bits_from_mwot(mwot))
+    from .binary import from_bits
+    return from_bits(bits_from_mwot(mwot))
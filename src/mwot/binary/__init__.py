@@ -1,20 +1,48 @@
 """Binary (bytes) language: conversions between bytes and MWOT bits."""
 
+import itertools
+import sys
+
 from ..join import joinable
 from .. import stypes
-from ..util import chunk_bits
+from .. import util
+from ..util import chunk_bits, chunks_hint, numpy_backend
 
-bitrange = range(8)[::-1]
+chunk_size = 8  # Bits per byte
+bitrange = range(chunk_size)[::-1]
 
 
-@joinable(bytes)
+@joinable(bytes, length_hint=lambda bits: chunks_hint(bits, chunk_size))
 def from_bits(bits):
-    """Yield bytes from MWOT bits."""
-    for chunk in chunk_bits(bits, chunk_size=8):
+    """Yield bytes from MWOT bits.
+
+    With NumPy installed, large inputs are packed a block at a time.
+    """
+    bits = iter(bits)
+    size = _block_size()
+    block = list(itertools.islice(bits, size))
+    backend = numpy_backend(len(block))
+    if backend is None:
+        yield from _from_bits(itertools.chain(block, bits))
+        return
+    while len(block) == size:
+        yield from backend.pack_bits(block)
+        block = list(itertools.islice(bits, size))
+    yield from _from_bits(block)
+
+
+def _block_size():
+    """Get `util.numpy_threshold` in whole bytes' worth of bits."""
+    threshold = min(util.numpy_threshold, sys.maxsize // chunk_size)
+    return max(-(-int(threshold) // chunk_size), 1) * chunk_size
+
+
+def _from_bits(bits):
+    for chunk in chunk_bits(bits, chunk_size=chunk_size):
         yield sum(b << i for i, b in zip(bitrange, chunk))
 
 
-@joinable()
+@joinable(length_hint=lambda chars: chunks_hint(chars, 1, scale=8))
 def to_bits(chars):
     """Convert bytes to MWOT bits."""
     stype, chars = stypes.probe(chars, default=stypes.BYTES)
@@ -23,3 +51,15 @@ def to_bits(chars):
     for byte in chars:
         for i in bitrange:
             yield (byte >> i) & 1
+
+
+def read_at(source, index, offset, length):
+    """Read `length` bytes at `offset` from indexed binary MWOT.
+
+    See `index.read_bits()`.
+    """
+    from ..index import read_bits
+
+    start = offset * chunk_size
+    bits = read_bits(source, index, start, start + length * chunk_size)
+    return from_bits(bits).join()
@@ -11,24 +11,26 @@ Instructions are mapped to bits in the following order:
     ]   111
 """
 
+import importlib
 import itertools
 
 from ..join import joinable
 from .. import stypes
-from ..util import chunk_bits
+from ..util import chunk_bits, chunks_hint
 
 cmds = b'><+-.,[]'
-allchunks = tuple(itertools.product((0, 1), repeat=3))  # 000 001 ...
+chunk_size = 3  # Bits per instruction
+allchunks = tuple(itertools.product((0, 1), repeat=chunk_size))  # 000 001 ...
 cmdmap = dict(zip(allchunks, cmds))
 chunkmap = dict(zip(cmds, allchunks))
 hello_world = (b'++++++++[>++++[>++>+++>+++>+<<<<-]>+>+>->>+[<]<-]>>.>---.++++'
                b'+++..+++.>>.<-.<.+++.------.--------.>>+.>++.')
 
 
-@joinable(bytes)
+@joinable(bytes, length_hint=lambda bits: chunks_hint(bits, chunk_size))
 def from_bits(bits):
     """Yield brainfuck instructions from MWOT bits."""
-    for chunk in chunk_bits(bits, chunk_size=3):
+    for chunk in chunk_bits(bits, chunk_size=chunk_size):
         yield cmdmap[chunk]
 
 
@@ -42,4 +44,8 @@ def to_bits(chars):
         yield from chunkmap.get(cmd, ())
 
 
-from . import interpreter
+def __getattr__(name):
+    # The interpreter is loaded on first use.
+    if name == 'interpreter':
+        return importlib.import_module('.interpreter', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
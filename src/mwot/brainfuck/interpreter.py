@@ -1,27 +1,82 @@
-"""Run brainfuck."""
+"""Run brainfuck.
 
-from collections import defaultdict
+A `Program` doesn't change once it's compiled, so it can be shared by
+any number of threads, each running its own `Machine` (or calling
+`Program.run()`). See `run_parallel()`.
+
+A `Program` is stored compactly, as flat lists of small ints (see
+`_Encoder`), and can be saved to a file as arrays and loaded again
+without recompiling. A `StreamingProgram` is compiled as it runs.
+Loops without I/O that run long enough are promoted to generated
+Python code (see `Machine`).
+"""
+
+from array import array
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+import io
+import itertools
+import re
+import struct
 import sys
+import threading
 
-from ..compiler import bits_from_mwot
+from ..compiler import bit_bytes, bits_from_blocks, bits_from_mwot
 from .. import stypes
-from ..util import Peekable, deshebang
-from . import cmds, from_bits as bf_from_bits
+from ..util import Peekable, deshebang, numpy_backend, warn_padding
+from . import chunk_size, cmdmap, cmds, from_bits as bf_from_bits
+from .tape import new_tape
+
+_OP_HALT = 0
+_OP_SHIFT = 1
+_OP_INC = 2
+_OP_OUT = 3
+_OP_IN = 4
+_OP_OPEN = 5
+_OP_CLOSE = 6
+_OP_SET = 7
+_OP_SCAN = 8
+_OP_MUL = 9
+# Loops with known pointer ranges: see `_Encoder`
+_OP_OPEN_RANGE = 10
+_OP_CLOSE_RANGE = 11
+_OP_OPEN_FAST = 12
+_OP_CLOSE_FAST = 13
+_OP_SHIFT_FAST = 14
+_OP_MUL_FAST = 15
+# Not compiled yet: see `StreamingProgram`
+_OP_OPEN_AHEAD = 16
+_OP_MORE = 17
+# Loops without I/O, and those promoted to generated code: see
+# `Machine._promote()`
+_OP_CLOSE_COUNT = 18
+_OP_HOT_OPEN = 19
+_OP_HOT_CLOSE = 20
 
-_OP_SHIFT = object()
-_OP_INC = object()
-_OP_OUT = object()
-_OP_IN = object()
-_OP_OPEN = object()
-_OP_CLOSE = object()
-_OP_SET = object()
-_OP_SCAN = object()
-_OP_MUL = object()
+_no_limit = sys.maxsize
+# Most steps to precompute before a program's first input
+prefix_budget = 1_000_000
+# Ops a `StreamingProgram` compiles at a time
+stream_chunk = 4096
+# Characters of MWOT compiled at a time when streaming
+stream_block_size = 1 << 18
+# MWOT programs to keep compiled, by the hash of their source
+mwot_cache_size = 32
+# Iterations of a loop without I/O before it becomes generated code
+hot_loop_threshold = 1000
+# Biggest loops (in ops) to generate code for
+hot_loop_max_ops = 10_000
+
+magic = b'MWOTBF\x01'  # Saved `Program`s
+# SHA-256 of the code, number of ops, sizes of `tables` and packed `muls`
+header = struct.Struct('<32sQQQ')
 
 
 def run(brainfuck, infile=None, outfile=None, cellsize=8, eof=None,
-        shebang_in=True, totalcells=30_000, wraparound=True):
-    """Run brainfuck code.
+        shebang_in=True, totalcells=30_000, wraparound=True,
+        checkpoint=None, checkpoint_every=None, resume=None, hook=None,
+        hook_every=None, hook_io=False, stream=False):
+    """Run brainfuck code (or a compiled `Program`).
 
     I/O is done in `bytes`, not `str`.
 
@@ -32,10 +87,43 @@ def run(brainfuck, infile=None, outfile=None, cellsize=8, eof=None,
         shebang_in: Whether a leading shebang will be recognized and
             ignored.
         totalcells: Number of cells. Can be falsy for dynamic size.
+            Tapes of at least `tape.paged_threshold` cells only use
+            memory for the pages that are written to.
         wraparound: Whether to overflow instead of error when the
             pointer goes out of bounds. Also determines whether "dynamic
             size" includes negative indices.
 
+    Checkpointing options:
+        checkpoint: Path to save snapshots of the program's state to.
+            Snapshots are taken at loop iterations and I/O, every
+            `checkpoint_every` steps, and on SIGUSR1 and SIGTERM (which
+            then exits).
+        checkpoint_every: Minimum number of steps between snapshots.
+        resume: Path of a snapshot to resume from. The program and
+            options must be the same. `infile` should hold the full
+            input; what was already read is skipped. `outfile` should
+            be positioned where the snapshot's output left off.
+
+    Hook options:
+        hook: Function called with the `Machine` every `hook_every`
+            steps (at the next loop iteration or I/O), after every I/O
+            instruction if `hook_io` is true, and once at the end, even
+            if there's an error. See `metrics.Metrics`. Without a hook,
+            there's no overhead.
+        hook_every: Minimum number of steps between hook calls.
+        hook_io: Whether to call the hook after each `,` and `.`.
+
+    Other options:
+        stream: Whether to compile the program as it runs, so it starts
+            sooner. See `StreamingProgram`.
+
+    Without checkpointing, the program starts from its precomputed
+    prefix (see `Program.prefix()`), so output before the first input
+    instruction is written at once.
+
+    Another thread can stop the run with a `Stopper` (see
+    `stop_with()`).
+
     infile and outfile default to sys.stdin.buffer and
     sys.stdout.buffer, respectively.
     """
@@ -43,95 +131,959 @@ def run(brainfuck, infile=None, outfile=None, cellsize=8, eof=None,
         infile = sys.stdin.buffer
     if outfile is None:
         outfile = sys.stdout.buffer
-    cell_mask = ~(~0 << cellsize) if cellsize else ~0
-    memory = [0] * totalcells if totalcells else defaultdict(int)
-    stype, brainfuck = stypes.probe(brainfuck, default=stypes.BYTES)
-    if stype is not stypes.BYTES:
-        raise TypeError('brainfuck must be bytes')
-    if shebang_in:
-        brainfuck = deshebang(brainfuck, stype)
-    ops = _make_program(chr(c) for c in brainfuck if c in cmds)
-    ops = _opt_set(ops)
-    ops = _opt_scan(ops)
-    ops = _opt_mul(ops)
-    program = tuple(ops)
-    jumps = _get_jumps(program)
-    pc = 0
-    pointer = 0
-
-    def pointer_too_low():
-        raise RuntimeError('pointer out of range (< 0)')
-
-    def pointer_too_high():
-        raise RuntimeError(f'pointer out of range (> {len(memory) - 1})')
-
-    while pc < len(program):
-        opcode, op_arg = program[pc]
-        if opcode is _OP_SHIFT:
-            pointer += op_arg
-            if wraparound:
-                if totalcells:
-                    pointer %= totalcells
-            elif pointer < 0:
-                pointer_too_low()
-            elif totalcells and pointer >= totalcells:
-                pointer_too_high()
-        elif opcode is _OP_INC:
-            memory[pointer] = (memory[pointer] + op_arg) & cell_mask
-        elif opcode is _OP_OPEN:
-            if not memory[pointer]:
-                pc = jumps[pc]
-        elif opcode is _OP_CLOSE:
-            if memory[pointer]:
-                pc = jumps[pc]
-        elif opcode is _OP_SET:
-            memory[pointer] = op_arg & cell_mask
-        elif opcode is _OP_MUL:
-            cell_value = memory[pointer]
-            if cell_value:
-                negative, muls = op_arg
-                if negative:
-                    cell_value = -cell_value
-                for offset, scalar in muls:
-                    mul_pointer = pointer + offset
+    if isinstance(brainfuck, Program):
+        program = brainfuck
+    elif stream:
+        program = StreamingProgram(brainfuck, shebang_in=shebang_in)
+    elif isinstance(brainfuck, (bytes, bytearray)):
+        program = _cached_program(bytes(brainfuck), shebang_in)
+    else:
+        program = Program(brainfuck, shebang_in=shebang_in)
+    machine = Machine(program, infile=infile, outfile=outfile,
+                      cellsize=cellsize, eof=eof, totalcells=totalcells,
+                      wraparound=wraparound)
+    stopper = getattr(_stoppers, 'stopper', None)
+    if stopper is not None:
+        stopper.watch(machine)
+    if resume is not None:
+        from .snapshot import Snapshot
+
+        machine.restore(Snapshot.load(resume))
+        _skip_input(infile, machine.input_pos)
+    if checkpoint is None and resume is None:
+        machine.skip_prefix()
+    if checkpoint is None and hook is None:
+        machine.step(_no_limit)
+        if stopper is not None:
+            stopper.check()
+        return
+    try:
+        _run_paused(machine, checkpoint, checkpoint_every, hook, hook_every,
+                    hook_io, stopper)
+    finally:
+        if hook is not None:
+            hook(machine)
+
+
+def _run_paused(machine, checkpoint, checkpoint_every, hook, hook_every,
+                hook_io, stopper=None):
+    """Run, pausing to take snapshots and call hooks."""
+    breaker = machine.breaker
+    next_checkpoint = _no_limit
+    next_hook = _no_limit
+    if checkpoint is not None and checkpoint_every:
+        next_checkpoint = machine.steps + checkpoint_every
+    if hook is not None and hook_every:
+        next_hook = machine.steps + hook_every
+    stop_signal = [None]
+    if checkpoint is None:
+        signals = nullcontext()
+    else:
+        signals = _checkpoint_signals(breaker, stop_signal)
+    with signals:
+        while True:
+            breaker[0] = min(next_checkpoint, next_hook)
+            if stopper is not None:
+                stopper.check()
+            machine.step(_no_limit, pause_on_io=hook_io)
+            if machine.halted:
+                break
+            signaled = not breaker[0]
+            if hook is not None and (hook_io or machine.steps >= next_hook):
+                hook(machine)
+                if hook_every:
+                    next_hook = machine.steps + hook_every
+            if checkpoint is not None and (
+                    signaled or machine.steps >= next_checkpoint):
+                machine.snapshot().save(checkpoint)
+                if checkpoint_every:
+                    next_checkpoint = machine.steps + checkpoint_every
+                if stop_signal[0] is not None:
+                    raise SystemExit(128 + stop_signal[0])
+
+
+def run_mwot(mwot, stream=False, **options):
+    """Compile MWOT to brainfuck and execute it.
+
+    The program is compiled (and cached) by `mwot_program()`. With
+    `stream`, the MWOT is compiled as the program runs instead.
+    """
+    if not stream:
+        run(mwot_program(mwot), **options)
+        return
+    if stypes.ask(mwot) is not None:
+        # Don't compile a whole string up front.
+        bits = bits_from_blocks(_blocks(mwot, stream_block_size))
+    else:
+        bits = bits_from_mwot(mwot)
+    run(bf_from_bits(bits), shebang_in=False, stream=True, **options)
+
+
+def _blocks(s, size):
+    """Split a text or byte string into `str` or `bytes` blocks."""
+    if not isinstance(s, str):
+        s = stypes.byte_view(s)
+    for start in range(0, len(s), size):
+        block = s[start:start + size]
+        yield block if isinstance(block, (str, bytes)) else bytes(block)
+
+
+def run_parallel(brainfuck, inputs, max_workers=None, **options):
+    """Run brainfuck once per input, in a thread pool.
+
+    The program is compiled once and shared. Returns a list of outputs
+    (as `bytes`), in the order of `inputs`. `options` are as in
+    `Machine`. On free-threaded Python, the runs use multiple cores.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not isinstance(brainfuck, Program):
+        brainfuck = Program(brainfuck)
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(
+            lambda data: brainfuck.run(data, **options), inputs))
+
+
+class Stopper:
+    """Stops `run()` calls from another thread (see `stop_with()`).
+
+    Once `stop()` is called, the current run and any later one raise
+    `KeyboardInterrupt` at their next loop iteration or I/O, as if
+    interrupted by Ctrl-C. With checkpointing, a snapshot is saved
+    first.
+    """
+
+    def __init__(self):
+        self.stopped = False
+        self._breaker = None  # The current run's
+
+    def stop(self):
+        self.stopped = True
+        breaker = self._breaker
+        if breaker is not None:
+            breaker[0] = 0
+
+    def watch(self, machine):
+        """Stop `machine` when stopped (and check now)."""
+        self._breaker = machine.breaker
+        self.check()
+
+    def check(self):
+        if self.stopped:
+            raise KeyboardInterrupt
+
+
+_stoppers = threading.local()
+
+
+@contextmanager
+def stop_with(stopper):
+    """Let `stopper` stop `run()` calls in this thread."""
+    _stoppers.stopper = stopper
+    try:
+        yield stopper
+    finally:
+        _stoppers.stopper = None
+
+
+class Program:
+    """Brainfuck, compiled once to be run by any number of `Machine`s.
+
+    `hash` is the hash of its instructions, which identifies snapshots.
+    It's computed the first time it's needed.
+    """
+
+    def __init__(self, brainfuck, shebang_in=True):
+        stype, brainfuck = stypes.probe(brainfuck, default=stypes.BYTES)
+        if stype is not stypes.BYTES:
+            raise TypeError('brainfuck must be bytes')
+        if shebang_in:
+            brainfuck = deshebang(brainfuck, stype)
+        if stypes.ask(brainfuck) is stypes.BYTES:
+            code = _non_cmd_pattern.sub(b'', brainfuck)
+        else:
+            code = bytes(c for c in brainfuck if c in cmds)
+        self._compile(code)
+
+    @classmethod
+    def from_bits(cls, bits):
+        """Compile MWOT bits (like from `compiler.bit_bytes()`).
+
+        The bits go straight to instructions, 3 at a time, without
+        `brainfuck.from_bits()`.
+        """
+        program = cls.__new__(cls)
+        program._compile(_code_from_bits(bits))
+        return program
+
+    def _compile(self, code):
+        """Compile instructions (as bytes, with nothing else)."""
+        encoder = _Encoder()
+        for opcode, op_arg in _optimized_ops(_ops_from_code(code)):
+            encoder.add(opcode, op_arg)
+        encoder.finish()
+        self._code = code
+        self._setup(None, *encoder.lists())
+
+    def _setup(self, hash_, codes, fast_codes, args, tables, muls):
+        self._hash = hash_
+        self.codes = codes
+        self.fast_codes = fast_codes
+        self.args = args
+        self.tables = tables
+        self.muls = muls
+        self._prefixes = {}
+        self._prefix_lock = threading.Lock()
+        self._loop_functions = {}
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            from .snapshot import program_hash
+
+            self._hash = program_hash(self._code)
+        return self._hash
+
+    def __len__(self):
+        """The number of ops (after optimization), including the end."""
+        return len(self.codes)
+
+    @classmethod
+    def load(cls, f):
+        """Read a program from a binary file written by `save()`."""
+        if f.read(len(magic)) != magic:
+            raise ValueError('not a saved brainfuck program')
+        digest, nops, ntables, nmuls = header.unpack(f.read(header.size))
+        sections = [array('B'), array('B'), array('q'), array('q'),
+                    array('q')]
+        sizes = [nops, nops, nops, ntables, nmuls]
+        for section, size in zip(sections, sizes):
+            data = f.read(size * section.itemsize)
+            if len(data) != size * section.itemsize:
+                raise ValueError('saved brainfuck program is truncated')
+            section.frombytes(data)
+            if sys.byteorder == 'big':
+                section.byteswap()
+        *lists, packed_muls = [section.tolist() for section in sections]
+        program = cls.__new__(cls)
+        program._setup(digest.hex(), *lists, _unpack_muls(packed_muls))
+        return program
+
+    def save(self, f):
+        """Write the program to a binary file, as arrays."""
+        packed_muls = _pack_muls(self.muls)
+        f.write(magic)
+        f.write(header.pack(bytes.fromhex(self.hash), len(self.codes),
+                            len(self.tables), len(packed_muls)))
+        sections = [array('B', self.codes), array('B', self.fast_codes),
+                    array('q', self.args), array('q', self.tables),
+                    packed_muls]
+        for section in sections:
+            if sys.byteorder == 'big':
+                section.byteswap()
+            f.write(section.tobytes())
+
+    def prefix(self, cellsize=8, totalcells=30_000, wraparound=True,
+               budget=prefix_budget):
+        """Run until the first input instruction, or for `budget` steps.
+
+        Nothing before the first input depends on it, so this is done
+        once per set of options and cached. Returns the paused
+        `Machine`, with its output kept, or None if the program errors
+        first. The `Machine` must not be modified.
+        """
+        key = (cellsize, totalcells, wraparound, budget)
+        with self._prefix_lock:
+            try:
+                return self._prefixes[key]
+            except KeyError:
+                pass
+            machine = Machine(self, cellsize=cellsize,
+                              totalcells=totalcells, wraparound=wraparound)
+            try:
+                machine._execute(budget, stop_on_input=True)
+            except RuntimeError:
+                machine = None
+            self._prefixes[key] = machine
+            return machine
+
+    def loop_function(self, start, cellsize=8):
+        """Generated code for the loop whose `[` is at `start`.
+
+        Made once per `cellsize` (and None if it can't be); see
+        `_LoopCompiler`.
+        """
+        key = (start, cellsize or 0)
+        try:
+            return self._loop_functions[key]
+        except KeyError:
+            function = _LoopCompiler(self, cellsize).compile(start)
+            return self._loop_functions.setdefault(key, function)
+
+    def run(self, data=b'', **options):
+        """Run with `data` as input, and return the output.
+
+        Each call uses a new `Machine`, so this is safe to call from
+        many threads at once. `options` are as in `Machine`.
+        """
+        machine = Machine(self, **options)
+        machine.skip_prefix()
+        return machine.run(data)
+
+
+class StreamingProgram(Program):
+    """A `Program` that's compiled as it runs, to start sooner.
+
+    Ops are compiled `stream_chunk` at a time as they're reached, and a
+    `[` whose loop is skipped compiles up to its `]`. So unmatched
+    brackets are only found when they're reached, and there's no
+    precomputed prefix. `hash` and `save()` compile the rest first.
+
+    It changes as it runs, so only one `Machine` can run it.
+    """
+
+    def __init__(self, brainfuck, shebang_in=True):
+        stype, brainfuck = stypes.probe(brainfuck, default=stypes.BYTES)
+        if stype is not stypes.BYTES:
+            raise TypeError('brainfuck must be bytes')
+        if shebang_in:
+            brainfuck = deshebang(brainfuck, stype)
+        self._code = bytearray()  # The instructions read so far
+        self._ops = _optimized_ops(_make_program(
+            self._read(iter(stypes.byte_view(brainfuck)))))
+        self._encoder = _Encoder()
+        (self.codes, self.fast_codes, self.args, self.tables,
+         self.muls) = self._encoder.lists()
+        self._hash = None
+        self._loop_functions = {}
+        self.codes.append(_OP_MORE)
+        self.fast_codes.append(_OP_MORE)
+        self.args.append(0)
+
+    def _read(self, brainfuck):
+        """Yield instructions as characters, keeping them in `_code`."""
+        while True:
+            block = bytes(itertools.islice(brainfuck, stream_chunk))
+            if not block:
+                return
+            block = _non_cmd_pattern.sub(b'', block)
+            self._code += block
+            yield from map(chr, block)
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            from .snapshot import program_hash
+
+            self.compile_rest()
+            self._hash = program_hash(bytes(self._code))
+        return self._hash
+
+    @property
+    def done(self):
+        """Whether the whole program has been compiled."""
+        return self.codes[-1] != _OP_MORE
+
+    def compile_more(self, n=stream_chunk):
+        """Compile up to `n` more ops (and the end, if it's reached)."""
+        if self.done:
+            return
+        self.codes.pop()
+        self.fast_codes.pop()
+        self.args.pop()
+        count = 0
+        for count, (opcode, op_arg) in enumerate(
+                itertools.islice(self._ops, n), 1):
+            self._encoder.add(opcode, op_arg)
+        if count < n:
+            self._encoder.finish()
+        else:
+            self.codes.append(_OP_MORE)
+            self.fast_codes.append(_OP_MORE)
+            self.args.append(0)
+
+    def compile_loop(self, pc):
+        """Compile up to the end of the loop whose `[` is at `pc`."""
+        while self.codes[pc] == _OP_OPEN_AHEAD and not self.done:
+            self.compile_more()
+
+    def compile_rest(self):
+        """Compile the rest of the program."""
+        while not self.done:
+            self.compile_more()
+
+    def prefix(self, *args, **kwargs):
+        return None
+
+    def save(self, f):
+        self.compile_rest()
+        super().save(f)
+
+
+_non_cmd_pattern = re.compile(rb'[^\[\]<>+\-.,]+')
+
+
+@lru_cache(maxsize=32)
+def _cached_program(brainfuck, shebang_in):
+    """Compile a `Program`, reusing recent ones (as `mwot serve` does)."""
+    return Program(brainfuck, shebang_in=shebang_in)
+
+
+_mwot_programs = {}  # By SHA-256 of the source, least recent first
+_mwot_programs_lock = threading.Lock()
+
+
+def mwot_program(mwot):
+    """Compile MWOT straight to a `Program` (see `Program.from_bits()`).
+
+    Whole strings are cached by the SHA-256 of their source, so a big
+    source isn't kept alive (or compared) to find its program. The
+    most recent `mwot_cache_size` are kept (as `mwot serve` does).
+    """
+    if stypes.ask(mwot) is None:
+        return Program.from_bits(bit_bytes(mwot))
+    import hashlib
+
+    if isinstance(mwot, str):
+        digest = hashlib.sha256(mwot.encode('utf-8', 'surrogatepass'))
+    else:
+        digest = hashlib.sha256(stypes.byte_view(mwot))
+    key = digest.digest()
+    with _mwot_programs_lock:
+        program = _mwot_programs.pop(key, None)
+        if program is not None:
+            _mwot_programs[key] = program
+            return program
+    program = Program.from_bits(bit_bytes(mwot))
+    with _mwot_programs_lock:
+        _mwot_programs[key] = program
+        while len(_mwot_programs) > mwot_cache_size:
+            del _mwot_programs[next(iter(_mwot_programs))]
+    return program
+
+
+class Machine:
+    """A brainfuck tape, pointer, and I/O, for running a `Program`.
+
+    Without `infile`, input is taken from `feed()`; without `outfile`,
+    output is kept for `take_output()`. Either way, I/O is in `bytes`.
+    The other options are as in `run()`.
+
+    Loops without I/O start out interpreted op by op, but once one has
+    run `hot_loop_threshold` iterations, it's promoted to generated code
+    (see `Program.loop_function()`) from then on.
+
+    A `Machine` must only be used by one thread at a time.
+    """
+
+    def __init__(self, program, infile=None, outfile=None, cellsize=8,
+                 eof=None, totalcells=30_000, wraparound=True):
+        if not isinstance(program, Program):
+            program = Program(program)
+        self.program = program
+        self.infile = infile
+        self.outfile = outfile
+        self.cellsize = cellsize
+        self.eof = eof
+        self.totalcells = totalcells
+        self.wraparound = wraparound
+        self.memory = new_tape(totalcells)
+        self.output = bytearray()
+        # Step count at which to pause at the next loop iteration or I/O
+        self.breaker = [_no_limit]
+        self.low = 0
+        self.high = 0
+        # The program's codes, or copies with promoted loops patched in
+        self._codes = program.codes
+        self._fast_codes = program.fast_codes
+        self._loop_functions = {}  # Promoted loops' functions, by `[`
+        self._iterations = {}  # Iterations of loops not promoted yet
+        self.reset()
+
+    @property
+    def halted(self):
+        """Whether the program has finished."""
+        return self.program.codes[self.pc] == _OP_HALT
+
+    @property
+    def options(self):
+        """The implementation options, as a dict."""
+        return {'cellsize': self.cellsize, 'eof': self.eof,
+                'totalcells': self.totalcells, 'wraparound': self.wraparound}
+
+    def reset(self):
+        """Restart the program with a blank tape and no I/O."""
+        if isinstance(self.memory, list):
+            # Only zero the cells that could have been written to.
+            low, high = self.low, self.high
+            if low < 0 or high >= self.totalcells:  # Wrapped around
+                low, high = 0, self.totalcells - 1
+            self.memory[low:high + 1] = [0] * (high + 1 - low)
+        else:
+            self.memory.clear()
+        self.pc = 0
+        self.pointer = 0
+        self.steps = 0
+        self.low = 0
+        self.high = 0
+        self.input_pos = 0
+        self.output_pos = 0
+        self.output.clear()
+        self._input = bytearray()  # Input from `feed()`
+        self._input_read = 0  # How much of it has been read
+
+    def feed(self, data):
+        """Add bytes to the input (when there's no `infile`)."""
+        # Drop what's been read, rather than keep it all.
+        del self._input[:self._input_read]
+        self._input_read = 0
+        self._input += data
+
+    def take_output(self):
+        """Remove and return the output kept so far, as bytes."""
+        output = bytes(self.output)
+        self.output.clear()
+        return output
+
+    def run(self, data=b''):
+        """Feed input, run to the end, and return all output."""
+        self.feed(data)
+        self.step(_no_limit)
+        return self.take_output()
+
+    def run_until_output(self):
+        """Run until a byte is output or the program ends.
+
+        Returns the output kept so far.
+        """
+        self._execute(_no_limit, stop_on_output=True)
+        return self.take_output()
+
+    def step(self, n=1, pause_on_io=False):
+        """Run at most `n` steps. Returns the number of steps run.
+
+        Pauses early if the program ends or `breaker` is tripped, or
+        after any I/O if `pause_on_io` is true.
+        """
+        start = self.steps
+        self._execute(start + n, stop_on_output=pause_on_io,
+                      stop_after_input=pause_on_io)
+        return self.steps - start
+
+    def skip_prefix(self, budget=prefix_budget):
+        """Start from the program's precomputed prefix, if it has one.
+
+        The prefix's output is written or kept at once. Only valid
+        before the machine has run; see `Program.prefix()`.
+        """
+        prefix = self.program.prefix(self.cellsize, self.totalcells,
+                                     self.wraparound, budget)
+        if prefix is None:
+            return
+        self.memory = prefix.memory.copy()
+        self.pc = prefix.pc
+        self.pointer = prefix.pointer
+        self.steps = prefix.steps
+        self.low = prefix.low
+        self.high = prefix.high
+        self.output_pos = prefix.output_pos
+        if self.outfile is None:
+            self.output += prefix.output
+        else:
+            self.outfile.write(prefix.output)
+            self.outfile.flush()
+
+    def snapshot(self):
+        """Capture the full state as a `snapshot.Snapshot`."""
+        from . import snapshot
+
+        return snapshot.Snapshot(
+            program=self.program.hash,
+            options=self.options,
+            pc=self.pc,
+            pointer=self.pointer,
+            steps=self.steps,
+            input_pos=self.input_pos,
+            output_pos=self.output_pos,
+            cells=snapshot.encode_cells(self.memory),
+        )
+
+    def restore(self, snap):
+        """Continue from a `snapshot.Snapshot` of the same program."""
+        from . import snapshot
+
+        snap.check(self.program.hash, self.options)
+        self.reset()
+        self.memory = snapshot.decode_cells(snap.cells, self.totalcells)
+        self.pc = snap.pc
+        self.pointer = snap.pointer
+        self.steps = snap.steps
+        self.input_pos = snap.input_pos
+        self.output_pos = snap.output_pos
+        starts = [start for start, _ in snap.cells]
+        ends = [start + len(values) - 1 for start, values in snap.cells]
+        self.low = min(starts + [0, self.pointer])
+        self.high = max(ends + [0, self.pointer])
+
+    def _promote(self, start):
+        """Run the loop whose `[` is at `start` as generated code.
+
+        Its brackets become `_OP_HOT_OPEN` and `_OP_HOT_CLOSE` in this
+        machine's copy of the codes. Returns whether it was promoted.
+        A `StreamingProgram` is left alone until it's fully compiled,
+        since its codes still change.
+        """
+        program = self.program
+        if not getattr(program, 'done', True):
+            self._iterations[start] = 0
+            return False
+        if self._codes is program.codes:
+            self._codes = program.codes.copy()
+            self._fast_codes = program.fast_codes.copy()
+        end = program.tables[program.args[start]]
+        function = program.loop_function(start, self.cellsize)
+        if function is None:
+            self._fast_codes[end] = _OP_CLOSE_FAST  # Stop counting
+            return False
+        self._loop_functions[start] = function
+        self._codes[start] = self._fast_codes[start] = _OP_HOT_OPEN
+        self._codes[end] = self._fast_codes[end] = _OP_HOT_CLOSE
+        return True
+
+    def _execute(self, limit, stop_on_output=False, stop_on_input=False,
+                 stop_after_input=False):
+        """The interpreter loop: run until `limit` steps have been run.
+
+        Loops that return the pointer to where it started are checked
+        against the tape's bounds as a whole, on entry and after each
+        iteration. Those that fit run from `fast_codes`, where the
+        pointer isn't checked (or wrapped) at all, until they end.
+
+        Loops without I/O count their iterations in `fast_codes` until
+        they're promoted; then they run as generated code whenever
+        they're entered in bounds (or continued after a pause).
+
+        Opcodes are compared with `is`, which is faster than `==`. They
+        are small ints, of which there's only ever one object each.
+        """
+        checked_codes = self._codes
+        fast_codes = self._fast_codes
+        codes = checked_codes
+        fast_end = None  # Where the loop running from `fast_codes` ends
+        args = self.program.args
+        tables = self.program.tables
+        muls = self.program.muls
+        loop_functions = self._loop_functions
+        iterations = self._iterations
+        threshold = hot_loop_threshold
+        memory = self.memory
+        breaker = self.breaker
+        infile = self.infile
+        input_buffer = self._input
+        outfile = self.outfile
+        output = self.output
+        eof = self.eof
+        totalcells = self.totalcells
+        wraparound = self.wraparound
+        cell_mask = ~(~0 << self.cellsize) if self.cellsize else ~0
+        # Pointer bounds, outside of which cells are wrapped or errors
+        if totalcells:
+            pointer_min, pointer_max = 0, totalcells - 1
+        else:
+            pointer_min = -_no_limit if wraparound else 0
+            pointer_max = _no_limit
+        pc = self.pc
+        pointer = self.pointer
+        steps = self.steps
+        low = self.low
+        high = self.high
+        input_pos = self.input_pos
+        input_read = self._input_read
+        output_pos = self.output_pos
+
+        try:
+            while steps < limit:
+                opcode = codes[pc]
+                steps += 1
+                if opcode is _OP_SHIFT_FAST:
+                    pointer += args[pc]
+                elif opcode is _OP_SHIFT:
+                    pointer += args[pc]
                     if wraparound:
                         if totalcells:
-                            mul_pointer %= totalcells
-                    elif mul_pointer < 0:
-                        pointer_too_low()
-                    elif totalcells and mul_pointer >= totalcells:
-                        pointer_too_high()
-                    memory[mul_pointer] = (
-                        memory[mul_pointer] + cell_value * scalar) & cell_mask
-                memory[pointer] = 0
-        elif opcode is _OP_SCAN:
-            while memory[pointer]:
-                pointer += op_arg
-                if wraparound:
-                    if totalcells:
-                        pointer %= totalcells
-                elif pointer < 0:
-                    pointer_too_low()
-                elif totalcells and pointer >= totalcells:
-                    pointer_too_high()
-        elif opcode is _OP_OUT:
-            byte = memory[pointer] & 0xff
-            outfile.write(bytes((byte,)))
-            outfile.flush()
-        elif opcode is _OP_IN:
-            char = infile.read(1)
-            if char:
-                (memory[pointer],) = char
-            elif eof is not None:
-                memory[pointer] = eof
-        else:
-            raise ValueError(f'unknown opcode: {opcode!r}')
-        pc += 1
+                            pointer %= totalcells
+                    elif pointer < 0:
+                        _pointer_too_low()
+                    elif totalcells and pointer >= totalcells:
+                        _pointer_too_high(memory)
+                    if pointer > high:
+                        high = pointer
+                    elif pointer < low:
+                        low = pointer
+                elif opcode is _OP_INC:
+                    memory[pointer] = (memory[pointer] + args[pc]) & cell_mask
+                elif opcode is _OP_OPEN:
+                    if not memory[pointer]:
+                        pc = args[pc]
+                elif opcode is _OP_CLOSE_FAST:
+                    if memory[pointer]:
+                        pc = args[pc]
+                        if steps >= breaker[0]:
+                            pc += 1
+                            break
+                    elif pc == fast_end:
+                        codes = checked_codes
+                elif opcode is _OP_CLOSE_COUNT:
+                    if memory[pointer]:
+                        pc = args[pc]
+                        if steps >= breaker[0]:
+                            pc += 1
+                            break
+                        count = iterations.get(pc, 0) + 1
+                        iterations[pc] = count
+                        if count >= threshold:
+                            promoted = self._promote(pc)
+                            checked_codes = self._codes
+                            codes = fast_codes = self._fast_codes
+                            if promoted:
+                                # Enter it again, as generated code.
+                                steps -= 1
+                                continue
+                    elif pc == fast_end:
+                        codes = checked_codes
+                elif opcode is _OP_CLOSE:
+                    if memory[pointer]:
+                        pc = args[pc]
+                        if steps >= breaker[0]:
+                            pc += 1
+                            break
+                elif opcode is _OP_OPEN_RANGE:
+                    loop = args[pc]
+                    if not memory[pointer]:
+                        pc = tables[loop]
+                    else:
+                        lowest = pointer + tables[loop + 1]
+                        highest = pointer + tables[loop + 2]
+                        if lowest >= pointer_min and highest <= pointer_max:
+                            codes = fast_codes
+                            fast_end = tables[loop]
+                            if highest > high:
+                                high = highest
+                            if lowest < low:
+                                low = lowest
+                elif opcode is _OP_CLOSE_RANGE:
+                    if memory[pointer]:
+                        pc = args[pc]
+                        if steps >= breaker[0]:
+                            pc += 1
+                            break
+                        loop = args[pc]
+                        lowest = pointer + tables[loop + 1]
+                        highest = pointer + tables[loop + 2]
+                        if lowest >= pointer_min and highest <= pointer_max:
+                            codes = fast_codes
+                            fast_end = tables[loop]
+                            if highest > high:
+                                high = highest
+                            if lowest < low:
+                                low = lowest
+                elif opcode is _OP_OPEN_FAST:
+                    if not memory[pointer]:
+                        pc = tables[args[pc]]
+                elif opcode is _OP_HOT_OPEN:
+                    loop = args[pc]
+                    if not memory[pointer]:
+                        pc = tables[loop]
+                    else:
+                        lowest = pointer + tables[loop + 1]
+                        highest = pointer + tables[loop + 2]
+                        if lowest >= pointer_min and highest <= pointer_max:
+                            if highest > high:
+                                high = highest
+                            if lowest < low:
+                                low = lowest
+                            pc, pointer, steps, paused = loop_functions[pc](
+                                memory, pointer, steps, limit, breaker)
+                            if paused:
+                                break
+                            end = tables[loop]
+                            if pc <= end:  # Stopped inside, at `limit`
+                                if codes is checked_codes:
+                                    codes = fast_codes
+                                    fast_end = end
+                            elif end == fast_end:
+                                codes = checked_codes
+                            continue
+                elif opcode is _OP_SET:
+                    memory[pointer] = args[pc] & cell_mask
+                elif opcode is _OP_MUL_FAST:
+                    cell_value = memory[pointer]
+                    if cell_value:
+                        negative, pairs, _, _ = muls[args[pc]]
+                        if negative:
+                            cell_value = -cell_value
+                        for offset, scalar in pairs:
+                            memory[pointer + offset] = (
+                                memory[pointer + offset] + cell_value * scalar
+                            ) & cell_mask
+                        memory[pointer] = 0
+                elif opcode is _OP_MUL:
+                    cell_value = memory[pointer]
+                    if cell_value:
+                        negative, pairs, low_offset, high_offset = (
+                            muls[args[pc]])
+                        if negative:
+                            cell_value = -cell_value
+                        for offset, scalar in pairs:
+                            mul_pointer = pointer + offset
+                            if wraparound:
+                                if totalcells:
+                                    mul_pointer %= totalcells
+                            elif mul_pointer < 0:
+                                _pointer_too_low()
+                            elif totalcells and mul_pointer >= totalcells:
+                                _pointer_too_high(memory)
+                            memory[mul_pointer] = (
+                                memory[mul_pointer] + cell_value * scalar
+                            ) & cell_mask
+                        memory[pointer] = 0
+                        if pointer + high_offset > high:
+                            high = pointer + high_offset
+                        if pointer + low_offset < low:
+                            low = pointer + low_offset
+                elif opcode is _OP_SCAN:
+                    op_arg = args[pc]
+                    while memory[pointer]:
+                        pointer += op_arg
+                        if wraparound:
+                            if totalcells:
+                                pointer %= totalcells
+                        elif pointer < 0:
+                            _pointer_too_low()
+                        elif totalcells and pointer >= totalcells:
+                            _pointer_too_high(memory)
+                    if pointer > high:
+                        high = pointer
+                    elif pointer < low:
+                        low = pointer
+                elif opcode is _OP_OUT:
+                    byte = memory[pointer] & 0xff
+                    if outfile is None:
+                        output.append(byte)
+                    else:
+                        outfile.write(bytes((byte,)))
+                        outfile.flush()
+                    output_pos += 1
+                    if stop_on_output or steps >= breaker[0]:
+                        pc += 1
+                        break
+                elif opcode is _OP_IN:
+                    if stop_on_input:
+                        steps -= 1
+                        break
+                    if infile is not None:
+                        char = infile.read(1)
+                        byte = char[0] if char else None
+                    elif input_read < len(input_buffer):
+                        byte = input_buffer[input_read]
+                        input_read += 1
+                    else:
+                        byte = None
+                    if byte is not None:
+                        memory[pointer] = byte
+                        input_pos += 1
+                    elif eof is not None:
+                        memory[pointer] = eof
+                    if stop_after_input or steps >= breaker[0]:
+                        pc += 1
+                        break
+                elif opcode is _OP_HOT_CLOSE:
+                    if memory[pointer]:
+                        pc = args[pc]
+                        if steps >= breaker[0]:
+                            pc += 1
+                            break
+                        # Run the rest of it as generated code.
+                        steps -= 1
+                        continue
+                    elif pc == fast_end:
+                        codes = checked_codes
+                elif opcode is _OP_HALT:
+                    steps -= 1
+                    break
+                elif opcode is _OP_OPEN_AHEAD:
+                    if not memory[pointer]:
+                        # Find the end of the loop, then try again.
+                        self.program.compile_loop(pc)
+                        steps -= 1
+                        continue
+                elif opcode is _OP_MORE:
+                    self.program.compile_more()
+                    steps -= 1
+                    continue
+                else:
+                    raise ValueError(f'unknown opcode: {opcode!r}')
+                pc += 1
+        finally:
+            self.pc = pc
+            self.pointer = pointer
+            self.steps = steps
+            self.low = low
+            self.high = high
+            self.input_pos = input_pos
+            self._input_read = input_read
+            self.output_pos = output_pos
+
 
+def _pointer_too_low():
+    raise RuntimeError('pointer out of range (< 0)')
+
+
+def _pointer_too_high(memory):
+    raise RuntimeError(f'pointer out of range (> {len(memory) - 1})')
+
+
+@contextmanager
+def _checkpoint_signals(breaker, stop_signal):
+    """Trip `breaker` on SIGUSR1 and SIGTERM while running.
+
+    SIGTERM also sets `stop_signal`.
+    """
+    import signal
 
-def run_mwot(mwot, **options):
-    """Compile MWOT to brainfuck and execute it."""
-    run(bf_from_bits(bits_from_mwot(mwot)), shebang_in=False, **options)
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    catchable = [getattr(signal, name) for name in ('SIGUSR1', 'SIGTERM')
+                 if hasattr(signal, name)]
+
+    def handler(signum, frame):
+        breaker[0] = 0
+        if signum != getattr(signal, 'SIGUSR1', None):
+            stop_signal[0] = signum
+
+    old_handlers = {signum: signal.signal(signum, handler)
+                    for signum in catchable}
+    try:
+        yield
+    finally:
+        for signum, old_handler in old_handlers.items():
+            signal.signal(signum, old_handler)
+
+
+def _skip_input(infile, n):
+    """Skip the `n` bytes of input that a snapshot already read."""
+    try:
+        if infile.seekable():
+            infile.seek(n, io.SEEK_CUR)
+            return
+    except (AttributeError, OSError):
+        pass
+    while n > 0:
+        skipped = len(infile.read(min(n, 1 << 16)))
+        if not skipped:
+            break
+        n -= skipped
 
 
 def _make_program(instructions):
@@ -181,22 +1133,78 @@ def _make_program(instructions):
             raise ValueError(f'unknown instruction: {instr!r}')
 
 
+def _ops_from_code(code):
+    """Like `_make_program()`, but for instructions in a byte string.
+
+    Runs of the same instruction are found by a regex, instead of one
+    character at a time.
+    """
+    for match in _run_pattern.finditer(code):
+        kind = match.lastindex
+        if kind == 1:
+            yield (_OP_SHIFT, match.end() - match.start())
+        elif kind == 2:
+            yield (_OP_SHIFT, match.start() - match.end())
+        elif kind == 3:
+            run = match.group()
+            inc = 2 * run.count(b'+') - len(run)
+            if inc:
+                yield (_OP_INC, inc)
+        else:
+            yield _single_ops[match.group()]
+
+
+# Runs of `>`, `<` or `+` and `-`, or another instruction (see
+# `_ops_from_code()`)
+_run_pattern = re.compile(rb'(>+)|(<+)|([-+]+)|(.)', re.DOTALL)
+_single_ops = {b'.': (_OP_OUT, None), b',': (_OP_IN, None),
+               b'[': (_OP_OPEN, None), b']': (_OP_CLOSE, None)}
+
+
+def _code_from_bits(bits):
+    """Get brainfuck instructions from MWOT bits, as bytes.
+
+    Like `brainfuck.from_bits()`, but the bits are grouped in C (or by
+    the NumPy backend), not one at a time.
+    """
+    bits = bytes(bits)
+    extra = len(bits) % chunk_size
+    if extra:
+        warn_padding(chunk_size)
+        bits += bytes(chunk_size - extra)
+    backend = numpy_backend(len(bits))
+    if backend is not None:
+        return backend.chunk_values(bits, chunk_size).translate(_cmd_table)
+    columns = [bits[i::chunk_size] for i in range(chunk_size)]
+    return bytes(map(cmdmap.__getitem__, zip(*columns)))
+
+
+_cmd_table = bytes.maketrans(bytes(range(len(cmds))), cmds)
+
+
+def _optimized_ops(ops):
+    """Optimize ops from `_make_program()`, lazily."""
+    ops = _opt_set(ops)
+    ops = _opt_scan(ops)
+    return _opt_mul(ops)
+
+
 def _opt_set(ops):
     """Optimize constant value assignments (like `[-]` or `[+]++`)."""
     ops = Peekable(ops)
     for opcode, op_arg in ops:
-        if opcode is _OP_OPEN:
+        if opcode == _OP_OPEN:
             peeker = ops.peeker()
             opcode_1, op_arg_1 = next(peeker, (None, None))
-            if opcode_1 is not _OP_INC or not op_arg_1 % 2:
+            if opcode_1 != _OP_INC or not op_arg_1 % 2:
                 yield (opcode, op_arg)
                 continue
             opcode_2, _ = next(peeker, (None, None))
-            if opcode_2 is not _OP_CLOSE:
+            if opcode_2 != _OP_CLOSE:
                 yield (opcode, op_arg)
                 continue
             opcode_3, op_arg_3 = next(peeker, (None, None))
-            if opcode_3 is _OP_INC:
+            if opcode_3 == _OP_INC:
                 yield (_OP_SET, op_arg_3)
                 ops.advance(3)
             else:
@@ -210,14 +1218,14 @@ def _opt_scan(ops):
     """Optimize shift-until-zero operations (like `[<<]`)."""
     ops = Peekable(ops)
     for opcode, op_arg in ops:
-        if opcode is _OP_OPEN:
+        if opcode == _OP_OPEN:
             peeker = ops.peeker()
             opcode_1, op_arg_1 = next(peeker, (None, None))
-            if opcode_1 is not _OP_SHIFT:
+            if opcode_1 != _OP_SHIFT:
                 yield (opcode, op_arg)
                 continue
             opcode_2, _ = next(peeker, (None, None))
-            if opcode_2 is not _OP_CLOSE:
+            if opcode_2 != _OP_CLOSE:
                 yield (opcode, op_arg)
                 continue
             yield (_OP_SCAN, op_arg_1)
@@ -235,21 +1243,21 @@ def _opt_mul(ops):
     """
     ops = Peekable(ops)
     for opcode, op_arg in ops:
-        if opcode is _OP_OPEN:
+        if opcode == _OP_OPEN:
             peeker = ops.peeker()
             offset = 0
             muls_map = {0: 0}
             n = None
             opcode_1 = None
             for n, (opcode_1, op_arg_1) in enumerate(peeker, 1):
-                if opcode_1 is _OP_SHIFT:
+                if opcode_1 == _OP_SHIFT:
                     offset += op_arg_1
                     muls_map.setdefault(offset, 0)
-                elif opcode_1 is _OP_INC:
+                elif opcode_1 == _OP_INC:
                     muls_map[offset] += op_arg_1
                 else:
                     break
-            if (opcode_1 is not _OP_CLOSE or offset != 0
+            if (opcode_1 != _OP_CLOSE or offset != 0
                     or abs(muls_map[0]) != 1):
                 yield (opcode, op_arg)
                 continue
@@ -259,24 +1267,277 @@ def _opt_mul(ops):
             offset_extrema = (min(muls_map), max(muls_map))
             muls = tuple((o, s) for o, s in muls_map.items()
                          if o and (s or o in offset_extrema))
-            yield (_OP_MUL, (muls_map[0] == 1, muls))
+            yield (_OP_MUL, (muls_map[0] == 1, muls, offset_extrema))
         else:
             yield (opcode, op_arg)
 
 
-def _get_jumps(program):
-    """Match brackets and map their positions to each other."""
-    stack = []
-    jumps = {}
-    for pc, (opcode, _) in enumerate(program):
-        if opcode is _OP_OPEN:
-            stack.append(pc)
-        elif opcode is _OP_CLOSE:
-            try:
-                target = stack.pop()
-            except IndexError:
-                raise ValueError("unmatched ']'") from None
-            jumps[pc], jumps[target] = target, pc
-    if stack:
-        raise ValueError("unmatched '['")
-    return jumps
+class _Encoder:
+    """Flattens ops into a `Program`'s lists, one op at a time.
+
+    Each op has an opcode in `codes` and an operand in `args`: a shift
+    or increment, a value to set, or the position of the matching
+    bracket. Multiplications instead have their index in `muls`, a list
+    of (negative, ((offset, scalar), ...), lowest offset, highest
+    offset).
+
+    Loops whose pointer range can be checked all at once have their `[`
+    point to an entry in `tables` instead: the position of the `]`, and
+    the lowest and highest offset from the starting cell. A loop
+    qualifies if its body leaves the pointer where it started and all
+    its inner loops qualify (so it has no scans). Then each iteration
+    starts at the same cell, and the range of cells it can reach is
+    known. Its brackets become `_OP_OPEN_RANGE` and `_OP_CLOSE_RANGE`.
+
+    `fast_codes` has the same layout, for running loops whose range is
+    in bounds: shifts and multiplications are unchecked, and those
+    loops' brackets become `_OP_OPEN_FAST` and `_OP_CLOSE_FAST`. Those
+    without I/O (which can become generated code; see `_LoopCompiler`)
+    end in `_OP_CLOSE_COUNT` instead, which counts their iterations.
+
+    A `[` is `_OP_OPEN_AHEAD` until its `]` is added.
+    """
+
+    def __init__(self):
+        self.codes = []
+        self.fast_codes = []
+        self.args = []
+        self.tables = []
+        self.muls = []
+        # For each loop being read: [start, offset, lowest, highest,
+        # qualifies, has I/O]
+        self._loops = []
+
+    def add(self, opcode, op_arg):
+        """Add an op from `_make_program()` (or an optimization)."""
+        codes = self.codes
+        fast_codes = self.fast_codes
+        args = self.args
+        loops = self._loops
+        fast_opcode = opcode
+        if opcode == _OP_SHIFT:
+            fast_opcode = _OP_SHIFT_FAST
+            if loops:
+                loop = loops[-1]
+                loop[1] += op_arg
+                loop[2] = min(loop[2], loop[1])
+                loop[3] = max(loop[3], loop[1])
+        elif opcode == _OP_MUL:
+            negative, pairs, (low_offset, high_offset) = op_arg
+            fast_opcode = _OP_MUL_FAST
+            op_arg = len(self.muls)
+            self.muls.append((negative, pairs, low_offset, high_offset))
+            if loops:
+                loop = loops[-1]
+                loop[2] = min(loop[2], loop[1] + low_offset)
+                loop[3] = max(loop[3], loop[1] + high_offset)
+        elif opcode == _OP_SCAN:
+            if loops:
+                loops[-1][4] = False
+        elif opcode == _OP_OUT or opcode == _OP_IN:
+            op_arg = 0
+            if loops:
+                loops[-1][5] = True
+        elif opcode == _OP_OPEN:
+            opcode = fast_opcode = _OP_OPEN_AHEAD
+            op_arg = 0
+            loops.append([len(codes), 0, 0, 0, True, False])
+        elif opcode == _OP_CLOSE:
+            if not loops:
+                raise ValueError("unmatched ']'")
+            start, offset, lowest, highest, qualifies, io = loops.pop()
+            pc = len(codes)
+            op_arg = start
+            if io and loops:
+                loops[-1][5] = True
+            if qualifies and not offset:
+                opcode = _OP_CLOSE_RANGE
+                fast_opcode = _OP_CLOSE_FAST if io else _OP_CLOSE_COUNT
+                codes[start] = _OP_OPEN_RANGE
+                fast_codes[start] = _OP_OPEN_FAST
+                args[start] = len(self.tables)
+                self.tables.extend((pc, lowest, highest))
+                if loops:
+                    outer = loops[-1]
+                    outer[2] = min(outer[2], outer[1] + lowest)
+                    outer[3] = max(outer[3], outer[1] + highest)
+            else:
+                codes[start] = fast_codes[start] = _OP_OPEN
+                args[start] = pc
+                if loops:
+                    loops[-1][4] = False
+        elif op_arg is None:
+            op_arg = 0
+        codes.append(opcode)
+        fast_codes.append(fast_opcode)
+        args.append(op_arg)
+
+    def finish(self):
+        """End the program."""
+        if self._loops:
+            raise ValueError("unmatched '['")
+        self.add(_OP_HALT, None)
+
+    def lists(self):
+        """Get (codes, fast_codes, args, tables, muls)."""
+        return (self.codes, self.fast_codes, self.args, self.tables,
+                self.muls)
+
+
+class _LoopCompiler:
+    """Generates a Python function that runs a loop without I/O.
+
+    The loop must be one whose range is checked all at once (see
+    `_Encoder`), so each of its cells is at a fixed offset from where
+    it starts, and the function doesn't have to move or check the
+    pointer at all. Cells are masked to `cellsize`; the tape's bounds
+    and wraparound only decide whether the loop's range is in bounds,
+    which is checked before it's called.
+
+    The function is called as `function(memory, pointer, steps, limit,
+    breaker)` with the loop's cell nonzero, at the start of its body,
+    and runs as the interpreter would. It returns (pc, pointer, steps,
+    paused): after the loop ends, or where it stopped to stay within
+    `limit`, or at the start of a loop's body if `breaker` was tripped
+    (then `paused` is true).
+    """
+
+    max_depth = 16  # Python only allows 20 nested loops
+
+    def __init__(self, program, cellsize):
+        self.program = program
+        self.cell_mask = ~(~0 << cellsize) if cellsize else ~0
+        self.mask = f' & {self.cell_mask}' if cellsize else ''
+        self.lines = []
+
+    def compile(self, start):
+        """Make the function for the loop at `start`, or None if its
+        body is too big or deep (or can't be compiled)."""
+        end = self.program.tables[self.program.args[start]]
+        if end - start > hot_loop_max_ops:
+            return None
+        self.lines = ['def loop(m, p, steps, limit, breaker):']
+        try:
+            self._loop(start, 0, 1, 0)
+        except ValueError:
+            return None
+        namespace = {}
+        exec(compile('\n'.join(self.lines), f'<loop at {start}>', 'exec'),
+             namespace)
+        return namespace['loop']
+
+    def _emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def _loop(self, start, offset, indent, depth):
+        """Emit the loop at `start`, whose cell is at `offset`."""
+        if depth >= self.max_depth:
+            raise ValueError('loop is nested too deeply')
+        program = self.program
+        codes = program.codes
+        args = program.args
+        tables = program.tables
+        end = tables[args[start]]
+        cell = _cell(offset)
+        self._emit(indent, 'while True:')
+        indent += 1
+        # The ops since the last check for `limit`, and where they start
+        pending = []
+        pending_pc = start + 1
+        pending_offset = offset
+        pc = start + 1
+        while pc < end:
+            opcode = codes[pc]
+            op_arg = args[pc]
+            target = _cell(offset)
+            if opcode == _OP_SHIFT:
+                offset += op_arg
+                pending.append([])
+            elif opcode == _OP_INC:
+                change = f'+ {op_arg}' if op_arg > 0 else f'- {-op_arg}'
+                pending.append([f'{target} = ({target} {change}){self.mask}'])
+            elif opcode == _OP_SET:
+                pending.append([f'{target} = {op_arg & self.cell_mask}'])
+            elif opcode == _OP_MUL:
+                pending.append(self._mul(offset, program.muls[op_arg]))
+            elif opcode == _OP_OPEN_RANGE or opcode == _OP_HOT_OPEN:
+                pending.append([])
+                self._flush(indent, pending, pending_pc, pending_offset)
+                self._emit(indent, f'if {_cell(offset)}:')
+                self._loop(pc, offset, indent + 1, depth + 1)
+                pending = []
+                pc = pending_pc = tables[op_arg] + 1
+                pending_offset = offset
+                continue
+            else:
+                raise ValueError(f"can't compile opcode {opcode!r}")
+            pc += 1
+        pending.append([])  # The `]`
+        self._flush(indent, pending, pending_pc, pending_offset)
+        self._emit(indent, f'if not {cell}:')
+        self._emit(indent + 1, f'return {end + 1}, p, steps, False'
+                   if not depth else 'break')
+        self._emit(indent, 'if steps >= breaker[0]:')
+        self._emit(indent + 1, f'return {start + 1}, {_pointer(offset)}, '
+                               f'steps, True')
+
+    def _flush(self, indent, pending, pc, offset):
+        """Emit `pending` ops, counting them after checking `limit`."""
+        self._emit(indent, f'if steps + {len(pending)} > limit:')
+        self._emit(indent + 1, f'return {pc}, {_pointer(offset)}, steps, '
+                               f'False')
+        self._emit(indent, f'steps += {len(pending)}')
+        for lines in pending:
+            for line in lines:
+                self._emit(indent, line)
+
+    def _mul(self, offset, mul):
+        negative, pairs, _, _ = mul
+        sign = '-' if negative else '+'
+        lines = [f'value = {_cell(offset)}', 'if value:']
+        for pair_offset, scalar in pairs:
+            if scalar:
+                target = _cell(offset + pair_offset)
+                product = 'value' if scalar == 1 else f'value * {scalar}'
+                lines.append(f'    {target} = ({target} {sign} '
+                             f'{product}){self.mask}')
+        lines.append(f'    {_cell(offset)} = 0')
+        return lines
+
+
+def _pointer(offset):
+    if not offset:
+        return 'p'
+    return f'p + {offset}' if offset > 0 else f'p - {-offset}'
+
+
+def _cell(offset):
+    return f'm[{_pointer(offset)}]'
+
+
+def _pack_muls(muls):
+    """Pack `muls` (see `_Encoder`) into an array of ints.
+
+    Each multiplication is: negative, count, lowest offset, highest
+    offset, then `count` (offset, scalar) pairs.
+    """
+    packed = array('q')
+    for negative, pairs, low_offset, high_offset in muls:
+        packed.extend((negative, len(pairs), low_offset, high_offset))
+        for pair in pairs:
+            packed.extend(pair)
+    return packed
+
+
+def _unpack_muls(packed):
+    """Undo `_pack_muls()` (given a list)."""
+    muls = []
+    i = 0
+    while i < len(packed):
+        negative, count, low_offset, high_offset = packed[i:i + 4]
+        i += 4
+        pairs = tuple(zip(packed[i:i + 2 * count:2],
+                          packed[i + 1:i + 2 * count:2]))
+        i += 2 * count
+        muls.append((bool(negative), pairs, low_offset, high_offset))
+    return muls
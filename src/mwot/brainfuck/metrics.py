@@ -0,0 +1,119 @@
+"""Counters for watching the brainfuck interpreter run."""
+
+import json
+import time
+
+
+class Metrics:
+    """Interpreter counters, kept up to date as a `run()` hook.
+
+    To also count the time spent blocked on I/O, pass the files through
+    `timed()` first.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.steps = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.tape_low = 0
+        self.tape_high = 0
+        self.tape_pages = None  # Only for paged tapes
+        self.io_seconds = 0.0
+
+    def __call__(self, machine):
+        self.seconds = time.perf_counter() - self.started
+        self.steps = machine.steps
+        self.input_bytes = machine.input_pos
+        self.output_bytes = machine.output_pos
+        self.tape_low = min(self.tape_low, machine.low)
+        self.tape_high = max(self.tape_high, machine.high)
+        self.tape_pages = getattr(machine.memory, 'resident_pages', None)
+
+    @property
+    def steps_per_second(self):
+        return self.steps / self.seconds if self.seconds else 0.0
+
+    def timed(self, f):
+        """Wrap a file to add the time its I/O takes to `io_seconds`."""
+        return TimedFile(f, self)
+
+    def as_dict(self):
+        """The counters, as a dict."""
+        counters = {
+            'steps': self.steps,
+            'seconds': self.seconds,
+            'steps_per_second': self.steps_per_second,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'tape_low': self.tape_low,
+            'tape_high': self.tape_high,
+            'io_seconds': self.io_seconds,
+        }
+        if self.tape_pages is not None:
+            counters['tape_pages'] = self.tape_pages
+        return counters
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2) + '\n'
+
+    def to_prometheus(self):
+        """The counters in Prometheus's text exposition format."""
+        lines = []
+        for name, value in self.as_dict().items():
+            metric_type, help_text = prometheus_info[name]
+            metric = f'mwot_{name}'
+            if metric_type == 'counter':
+                metric += '_total'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} {metric_type}')
+            lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path):
+        """Write the counters as JSON (Prometheus if `path` is *.prom)."""
+        text = self.to_prometheus() if path.endswith('.prom') else (
+            self.to_json())
+        with open(path, 'wt') as f:
+            f.write(text)
+
+
+prometheus_info = {
+    'steps': ('counter', 'Brainfuck instructions executed.'),
+    'seconds': ('gauge', 'Time spent running, in seconds.'),
+    'steps_per_second': ('gauge', 'Average instructions per second.'),
+    'input_bytes': ('counter', 'Bytes of input read.'),
+    'output_bytes': ('counter', 'Bytes of output written.'),
+    'tape_low': ('gauge', 'Lowest cell index reached.'),
+    'tape_high': ('gauge', 'Highest cell index reached.'),
+    'io_seconds': ('counter', 'Time spent blocked on I/O, in seconds.'),
+    'tape_pages': ('gauge', 'Tape pages allocated.'),
+}
+
+
+class TimedFile:
+    """File wrapper that times reads, writes and flushes."""
+
+    def __init__(self, f, metrics):
+        self._file = f
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._metrics.io_seconds += time.perf_counter() - start
+
+    def read(self, *args):
+        return self._timed(self._file.read, *args)
+
+    def write(self, data):
+        return self._timed(self._file.write, data)
+
+    def flush(self):
+        return self._timed(self._file.flush)
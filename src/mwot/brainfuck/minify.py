@@ -0,0 +1,109 @@
+"""Shorten brainfuck without changing what it does.
+
+Since every instruction costs three MWOT words, this makes for smaller
+MWOT too. The passes:
+    - Comments are removed.
+    - Runs of `+`/`-` and of `<`/`>` are reduced to their net effect,
+      repeatedly (so `+>-<-` becomes nothing).
+    - Loops that can't be entered are removed: those at the start of
+      the program or right after another loop (like a leading comment
+      loop, or `[-]` when the cell is already zero).
+    - `+`, `-`, `<` and `>` after the last loop or I/O are removed.
+
+The pointer is assumed to wrap around or have room, so an out-of-range
+error that would have happened (like from `<>` at cell 0) may not.
+"""
+
+from .. import stypes
+from . import cmds
+from .interpreter import (_OP_CLOSE, _OP_IN, _OP_INC, _OP_OPEN, _OP_OUT,
+                          _OP_SHIFT, _make_program)
+
+_emit = {
+    _OP_OUT: b'.',
+    _OP_IN: b',',
+    _OP_OPEN: b'[',
+    _OP_CLOSE: b']',
+}
+
+
+def minify(brainfuck):
+    """Minify brainfuck (as bytes). Returns `bytes`."""
+    stype, brainfuck = stypes.probe(brainfuck, default=stypes.BYTES)
+    if stype is not stypes.BYTES:
+        raise TypeError('brainfuck must be bytes')
+    ops = _make_program(chr(c) for c in brainfuck if c in cmds)
+    ops = _peephole(ops)
+    return b''.join(map(_emit_op, _trim_end(ops)))
+
+
+def _peephole(ops):
+    """Merge runs of shifts and increments, and drop dead loops."""
+    out = []
+    # (whether no cell has been written, whether this cell is zero)
+    # after each op in `out`
+    states = []
+    state = (True, True)
+    ops = iter(ops)
+    depth = 0
+    for opcode, op_arg in ops:
+        fresh, zero = state
+        if opcode == _OP_OPEN and zero:
+            _skip_loop(ops)
+            continue
+        if opcode in (_OP_SHIFT, _OP_INC) and out and out[-1][0] == opcode:
+            merged = out[-1][1] + op_arg
+            out.pop()
+            states.pop()
+            state = states[-1] if states else (True, True)
+            if not merged:
+                continue
+            op_arg = merged
+            fresh, zero = state
+        if opcode == _OP_SHIFT:
+            state = (fresh, fresh)
+        elif opcode in (_OP_INC, _OP_IN):
+            state = (False, False)
+        elif opcode == _OP_OPEN:
+            depth += 1
+            state = (False, False)
+        elif opcode == _OP_CLOSE:
+            if not depth:
+                raise ValueError("unmatched ']'")
+            depth -= 1
+            state = (False, True)
+        out.append((opcode, op_arg))
+        states.append(state)
+    if depth:
+        raise ValueError("unmatched '['")
+    return out
+
+
+def _skip_loop(ops):
+    """Skip past the rest of a loop whose `[` was just taken."""
+    depth = 1
+    for opcode, _ in ops:
+        if opcode == _OP_OPEN:
+            depth += 1
+        elif opcode == _OP_CLOSE:
+            depth -= 1
+            if not depth:
+                return
+    raise ValueError("unmatched '['")
+
+
+def _trim_end(ops):
+    """Drop trailing ops with no effect that can be seen."""
+    end = len(ops)
+    while end and ops[end - 1][0] in (_OP_SHIFT, _OP_INC):
+        end -= 1
+    return ops[:end]
+
+
+def _emit_op(op):
+    opcode, op_arg = op
+    if opcode == _OP_SHIFT:
+        return b'>' * op_arg if op_arg > 0 else b'<' * -op_arg
+    if opcode == _OP_INC:
+        return b'+' * op_arg if op_arg > 0 else b'-' * -op_arg
+    return _emit[opcode]
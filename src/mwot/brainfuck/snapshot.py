@@ -0,0 +1,85 @@
+"""Interpreter snapshots, for checkpointing and resuming brainfuck."""
+
+import hashlib
+import json
+import os
+import zlib
+
+from .tape import new_tape
+
+version = 1
+
+
+def program_hash(code):
+    """Hash brainfuck instructions (as bytes)."""
+    return hashlib.sha256(code).hexdigest()
+
+
+def encode_cells(memory):
+    """Encode a tape as runs of nonzero cells: [[start, [values]], ...].
+
+    `memory` can be a list, a dict or a `tape.PagedTape` of cells.
+    """
+    if not isinstance(memory, list):
+        indices = sorted(i for i, value in memory.items() if value)
+    else:
+        indices = [i for i, value in enumerate(memory) if value]
+    runs = []
+    for i in indices:
+        if runs and runs[-1][0] + len(runs[-1][1]) == i:
+            runs[-1][1].append(memory[i])
+        else:
+            runs.append([i, [memory[i]]])
+    return runs
+
+
+def decode_cells(runs, totalcells):
+    """Rebuild a tape from `encode_cells()` runs."""
+    memory = new_tape(totalcells)
+    for start, values in runs:
+        if isinstance(memory, list):
+            memory[start:start + len(values)] = values
+        else:
+            for i, value in enumerate(values, start):
+                memory[i] = value
+    return memory
+
+
+class Snapshot:
+    """The full state of a paused brainfuck program."""
+
+    def __init__(self, program, options, pc, pointer, steps, input_pos,
+                 output_pos, cells):
+        self.program = program
+        self.options = options
+        self.pc = pc
+        self.pointer = pointer
+        self.steps = steps
+        self.input_pos = input_pos
+        self.output_pos = output_pos
+        self.cells = cells
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot file."""
+        with open(path, 'rb') as f:
+            data = json.loads(zlib.decompress(f.read()))
+        if data.pop('version') != version:
+            raise ValueError('unsupported snapshot version')
+        return cls(**data)
+
+    def save(self, path):
+        """Write a snapshot file, replacing any old one atomically."""
+        data = {'version': version, **vars(self)}
+        packed = zlib.compress(json.dumps(data).encode())
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(packed)
+        os.replace(temp_path, path)
+
+    def check(self, program, options):
+        """Raise ValueError if this isn't a snapshot of `program`."""
+        if self.program != program:
+            raise ValueError('snapshot is of a different program')
+        if self.options != options:
+            raise ValueError('snapshot used different interpreter options')
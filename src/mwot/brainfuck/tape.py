@@ -0,0 +1,78 @@
+"""Brainfuck tapes: lists, dicts, and pages for huge fixed sizes."""
+
+from collections import defaultdict
+
+paged_threshold = 1 << 20  # Fixed tapes at least this long are paged
+default_page_size = 4096  # Cells per page (a power of 2)
+
+
+def new_tape(totalcells):
+    """Make a blank tape of `totalcells` cells.
+
+    That's a list, or a `PagedTape` if it's at least `paged_threshold`
+    long, or a `defaultdict` if `totalcells` is falsy (dynamic size).
+    """
+    if not totalcells:
+        return defaultdict(int)
+    if totalcells >= paged_threshold:
+        return PagedTape(totalcells)
+    return [0] * totalcells
+
+
+class PagedTape:
+    """A fixed-size tape that only stores the pages that were written.
+
+    A page is allocated, zeroed, on the first nonzero write to it. Pages
+    are `bytearray`s until a cell needs a value outside `range(256)`
+    (with big cells or an odd `eof`), when that page becomes a list.
+    Indices must be in `range(totalcells)`.
+    """
+
+    __slots__ = ('totalcells', 'page_size', 'pages', '_shift', '_mask')
+
+    def __init__(self, totalcells, page_size=default_page_size):
+        if page_size & (page_size - 1):
+            raise ValueError('page_size must be a power of 2')
+        self.totalcells = totalcells
+        self.page_size = page_size
+        self.pages = {}
+        self._shift = page_size.bit_length() - 1
+        self._mask = page_size - 1
+
+    def __len__(self):
+        return self.totalcells
+
+    def __getitem__(self, i):
+        page = self.pages.get(i >> self._shift)
+        return 0 if page is None else page[i & self._mask]
+
+    def __setitem__(self, i, value):
+        key = i >> self._shift
+        try:
+            self.pages[key][i & self._mask] = value
+        except KeyError:
+            if value:
+                self.pages[key] = bytearray(self.page_size)
+                self[i] = value
+        except ValueError:  # Too big for a byte
+            page = self.pages[key] = list(self.pages[key])
+            page[i & self._mask] = value
+
+    @property
+    def resident_pages(self):
+        """How many pages are allocated."""
+        return len(self.pages)
+
+    def items(self):
+        """Yield (index, value) for the cells of allocated pages."""
+        for key in sorted(self.pages):
+            start = key << self._shift
+            yield from enumerate(self.pages[key], start)
+
+    def copy(self):
+        tape = PagedTape(self.totalcells, self.page_size)
+        tape.pages = {key: page.copy() for key, page in self.pages.items()}
+        return tape
+
+    def clear(self):
+        self.pages.clear()
@@ -1,24 +1,58 @@
 """MWOT's CLI."""
 
-import argparse
+import importlib
+import os
 import sys
 
-from .. import binary
-from .. import brainfuck
-from .actions import Compile, Decompile, Interpret, Execute
-from .parsing import parse
-
 
 def main(args=None):
     args = sys.argv[1:] if args is None else list(args)
 
-    _, parsed = parse(args)
+    if args[:1] == ['serve']:
+        return serve(args[1:])
+    if os.environ.get('MWOT_SOCKET') and 'MWOT_SERVING' not in os.environ:
+        # Thin client mode: let a warm server do the work if it's up.
+        from .server import forward
+        try:
+            status = forward(args)
+        except (KeyboardInterrupt, BrokenPipeError):
+            return None
+        if status is not None:
+            return status
+
+    return dispatch(parse_args(args))
+
+
+def parse_args(args, cwd=None):
+    """Parse arguments, the quick way if possible.
+
+    Relative paths are resolved against `cwd`, if given.
+    """
+    from .parsing import parse, parse_fast, resolve_paths
+
+    parsed = parse_fast(args)
+    if parsed is None:
+        _, parsed = parse(args, cwd)
+    elif cwd is not None:
+        resolve_paths(parsed, cwd)
+    return parsed
+
 
+def dispatch(parsed):
+    """Run the action for parsed arguments."""
+    if parsed.outdir is not None:
+        from .batch import run_batch
+        return run_batch(parsed)
+
+    from .actions import Compile, Decompile, Interpret, Execute
+
+    # Only load the format that's needed.
     format_modules = {
-        'brainfuck': brainfuck,
-        'binary': binary,
+        'brainfuck': '..brainfuck',
+        'binary': '..binary',
     }
-    format_module = format_modules[parsed.format]
+    format_module = importlib.import_module(format_modules[parsed.format],
+                                            __name__)
     action_map = {
         'compile': Compile,
         'decompile': Decompile,
@@ -31,3 +65,18 @@ def main(args=None):
         action(parsed, format_module)
     except (KeyboardInterrupt, BrokenPipeError):
         pass
+
+
+def serve(args):
+    """`mwot serve [SOCKET]`: serve CLI requests over a Unix socket."""
+    from .server import serve as serve_forever
+
+    if len(args) > 1 or args[:1] in (['-h'], ['--help']):
+        print('usage: mwot serve [SOCKET]', file=sys.stderr)
+        return 2
+    # Requests must not be forwarded back to this server.
+    os.environ['MWOT_SERVING'] = '1'
+    try:
+        serve_forever(*args)
+    except KeyboardInterrupt:
+        pass
@@ -1,13 +1,17 @@
 """CLI actions: compile, decompile, interpret, execute."""
 
+from contextlib import nullcontext
+import itertools
 import os
 import stat
 import sys
 
-from ..compiler import bits_from_mwot
+from ..compiler import bit_bytes, bits_from_blocks, bits_from_mwot
 from .. import decompilers
+from ..brainfuck import cmds
+from ..join import Joinable
 from .. import stypes
-from ..util import chunks, deshebang
+from ..util import deshebang
 from .parsing import Unspecified
 from .sources import Source, StringSource
 
@@ -25,6 +29,21 @@ def chmod_x(f):
         os.fchmod(fd, mode)
 
 
+class NoTimings:
+    """Stand-in for a disabled `Timings`, to skip importing it."""
+
+    enabled = False
+
+    def phase(self, name):
+        return nullcontext()
+
+    def finish(self, name, joinable):
+        return joinable
+
+    def file(self, f, name):
+        return f
+
+
 def specced(namespace, keywords):
     """Get a dictionary of non-`Unspecified` attributes."""
     specified = {}
@@ -44,7 +63,17 @@ class Action:
         self.args = parsed
         self.format = format_module
         self.kwargs = specced(parsed, self.keywords)
-        self.run()
+        if parsed.timings is None:
+            self.timings = NoTimings()
+        else:
+            from .timings import Timings
+
+            self.timings = Timings(trace_memory=parsed.trace_memory)
+        try:
+            self.run()
+        finally:
+            if parsed.timings is not None:
+                self.timings.report(parsed.timings)
 
     def get_source(self):
         """Retrieve the correct code source."""
@@ -64,35 +93,170 @@ class Action:
 class TranspilerAction(Action):
 
     def run(self):
+        if self.args.pipeline:
+            self.run_pipelined()
+            return
         source = self.get_source()
-        output = self.transpile(source.read())
-        with self.open_outfile() as f:
+        with self.timings.phase('read'):
+            source_code = source.read()
+        output = self.transpile(source_code)
+        with self.open_outfile() as f, self.timings.phase('write'):
             self.write(f, output)
 
+    def run_pipelined(self):
+        """Read, transpile and write at the same time."""
+        from .pipeline import Reader, Writer
+
+        with self.get_source().open() as src, Reader(src) as blocks:
+            with self.open_outfile() as f, Writer(f) as writer:
+                self.write(writer, self.transpile_blocks(blocks))
+
+    def transpile_blocks(self, blocks):
+        """Transpile source that's read in blocks."""
+        return self.transpile(itertools.chain.from_iterable(blocks))
+
+    def minify(self, brainfuck):
+        """Minify brainfuck, reporting the reduction to stderr."""
+        from ..brainfuck.minify import minify
+
+        brainfuck = bytes(brainfuck)
+        before = sum(c in cmds for c in brainfuck)
+        with self.timings.phase('minify'):
+            minified = minify(brainfuck)
+        after = len(minified)
+        saved = 100 * (before - after) // before if before else 0
+        print(f'mwot: minified {before} instructions to {after} ({saved}% '
+              f'smaller)', file=sys.stderr)
+        return minified
+
+    def header_out(self):
+        """Whether to start the output with a shebang."""
+        return self.args.shebang_out and self.args.format == 'brainfuck'
+
     def write(self, f, output):
-        if self.args.shebang_out and self.args.format == 'brainfuck':
+        if self.header_out():
             f.write(self.bf_shebang)
-        if self.stype_out is stypes.BYTES:
-            for chunk in chunks(output, 80):
-                f.write(bytes(chunk))
-        else:
-            for i in output:
-                f.write(i)
+        self.write_body(f, output)
+
+    def write_body(self, f, output):
+        output.write_to(f)
 
 
 class Compile(TranspilerAction):
 
-    stype_in = stypes.TEXT
+    stype_in = stypes.BYTES
     stype_out = stypes.BYTES
     bf_shebang = b'#!/usr/bin/env -S mwot -xb\n'
 
+    def run(self):
+        if self.args.incremental:
+            self.run_incremental()
+        elif self.args.range is not None:
+            self.run_range()
+        else:
+            super().run()
+
+    def run_range(self):
+        """Compile only the requested range, using an index."""
+        from ..index import read_bits
+
+        start, stop = self.args.range
+        size = self.format.chunk_size
+        with open(self.args.srcfile, 'rb') as src:
+            index = self.get_index(src)
+            bits = read_bits(src, index, start * size, stop * size)
+            with self.open_outfile() as f:
+                self.write(f, self.transpile_bits(bits))
+
+    def get_index(self, src):
+        """Load SRCFILE's index, (re)building it if it's stale."""
+        import struct
+
+        from ..index import Index
+
+        index_path = f'{self.args.srcfile}.mwoti'
+        src_stat = os.stat(src.fileno())
+        try:
+            if os.stat(index_path).st_mtime_ns >= src_stat.st_mtime_ns:
+                with open(index_path, 'rb') as f:
+                    index = Index.load(f)
+                if index.size == src_stat.st_size:
+                    return index
+        except (OSError, ValueError, struct.error):
+            pass
+        index = Index.build(src)
+        with open(index_path, 'wb') as f:
+            index.save(f)
+        return index
+
+    def run_incremental(self):
+        """Recompile only what changed since the last run."""
+        from .. import incremental
+
+        cache_path = f'{self.args.srcfile}.mwotc'
+        cache = incremental.BitCache.load(cache_path)
+        cache, first_changed = incremental.recompile(
+            stypes.decode(self.get_source().read()), cache)
+        output_info = {
+            'path': os.path.abspath(self.args.outfile),
+            'format': self.args.format,
+            'shebang': self.args.shebang_out,
+            'executable': self.args.executable_out,
+        }
+        if self.args.outfile == '-' or not self.output_matches(cache.output,
+                                                               output_info):
+            with self.open_outfile() as f:
+                self.write(f, self.transpile_bits(cache.bits))
+        else:
+            # Rewrite the output file from the first changed chunk on.
+            chunk = first_changed // self.format.chunk_size
+            header = self.bf_shebang if self.header_out() else b''
+            with open(self.args.outfile, 'r+b') as f:
+                f.seek(len(header) + chunk)
+                start_bit = chunk * self.format.chunk_size
+                bits = memoryview(cache.bits)[start_bit:]
+                self.write_body(f, self.transpile_bits(bits))
+                f.truncate()
+        if self.args.outfile != '-':
+            st = os.stat(self.args.outfile)
+            output_info['size'] = st.st_size
+            output_info['mtime_ns'] = st.st_mtime_ns
+            cache.output = output_info
+        else:
+            cache.output = None
+        cache.save(cache_path)
+
+    def output_matches(self, cached, current):
+        """Is the output file unchanged since `cached` was recorded?"""
+        if not cached:
+            return False
+        try:
+            st = os.stat(self.args.outfile)
+        except OSError:
+            return False
+        return cached == {**current, 'size': st.st_size,
+                          'mtime_ns': st.st_mtime_ns}
+
     def transpile(self, source_code):
-        return self.format.from_bits(bits_from_mwot(source_code))
+        bits = self.timings.finish('compile', bits_from_mwot(source_code))
+        return self.transpile_bits(bits)
+
+    def transpile_blocks(self, blocks):
+        return self.transpile_bits(bits_from_blocks(blocks))
+
+    def transpile_bits(self, bits):
+        output = self.timings.finish('encode', self.format.from_bits(bits))
+        if self.args.minify:
+            output = Joinable(iter(self.minify(output)), bytes)
+        return output
 
     def write(self, f, output):
         if self.args.executable_out:
             chmod_x(f)
         super().write(f, output)
+
+    def write_body(self, f, output):
+        super().write_body(f, output)
         if self.args.format == 'brainfuck':
             f.write(b'\n')
 
@@ -102,13 +266,16 @@ class Decompile(TranspilerAction):
     stype_in = stypes.BYTES
     stype_out = stypes.TEXT
     bf_shebang = '#!/usr/bin/env -S mwot -ib\n'
-    keywords = ('width', 'vocab', 'cols')
+    keywords = ('width', 'vocab', 'words', 'cols')
 
     def transpile(self, source_code):
         decomp = getattr(decompilers, self.args.decompiler).decomp
         if self.args.shebang_in and self.args.format == 'brainfuck':
             source_code = deshebang(source_code, self.stype_in)
-        return decomp(self.format.to_bits(source_code), **self.kwargs)
+        if self.args.minify:
+            source_code = self.minify(source_code)
+        bits = self.timings.finish('decode', self.format.to_bits(source_code))
+        return self.timings.finish('decompile', decomp(bits, **self.kwargs))
 
     def write(self, f, output):
         if self.args.executable_out and self.args.format == 'brainfuck':
@@ -130,27 +297,95 @@ class InterpreterAction(Action):
             return StringSource(b'')
         return Source('-', stypes.BYTES)
 
+    def open_outfile(self):
+        resume = self.kwargs.get('resume')
+        if resume is None or self.args.outfile == '-':
+            return super().open_outfile()
+        from ..brainfuck import snapshot
+
+        # Continue the output where the snapshot left off.
+        output_pos = snapshot.Snapshot.load(resume).output_pos
+        f = open(self.args.outfile, 'r+b')
+        f.truncate(output_pos)
+        f.seek(output_pos)
+        return f
+
     def run(self):
-        source_code = self.get_source().read()
+        source = self.get_source()
+        with self.timings.phase('read'):
+            source_code = source.read()
         with self.get_input().open() as infile, self.open_outfile() as outfile:
+            infile = self.timings.file(infile, 'input')
+            outfile = self.timings.file(outfile, 'output')
+            if self.args.pipeline:
+                from .pipeline import Reader, Writer
+
+                with Reader(infile) as reader, Writer(outfile) as writer:
+                    self.execute_with(source_code, reader, writer)
+            else:
+                self.execute_with(source_code, infile, outfile)
+
+    def execute_with(self, source_code, infile, outfile):
+        """Execute with the given files, keeping stats if requested."""
+        if self.args.stats is None:
             self.kwargs['infile'] = infile
             self.kwargs['outfile'] = outfile
             self.execute(source_code)
+            return
+        from ..brainfuck import metrics
+
+        stats = metrics.Metrics()
+        self.kwargs['infile'] = stats.timed(infile)
+        self.kwargs['outfile'] = stats.timed(outfile)
+        self.kwargs['hook'] = stats
+        try:
+            self.execute(source_code)
+        finally:
+            stats.save(self.args.stats)
+
+    def run_timed(self, brainfuck, shebang_in=True):
+        """Optimize and execute brainfuck (or a `Program`), timed."""
+        interpreter = self.format.interpreter
+        if isinstance(brainfuck, interpreter.Program):
+            program = brainfuck
+        else:
+            with self.timings.phase('optimize'):
+                program = interpreter.Program(brainfuck,
+                                              shebang_in=shebang_in)
+        kwargs = {key: value for key, value in self.kwargs.items()
+                  if key != 'shebang_in'}
+        with self.timings.phase('execute'):
+            interpreter.run(program, **kwargs)
 
 
 class Interpret(InterpreterAction):
 
-    stype_in = stypes.TEXT
-    keywords = ('cellsize', 'eof', 'totalcells', 'wraparound')
+    stype_in = stypes.BYTES
+    keywords = ('cellsize', 'eof', 'totalcells', 'wraparound', 'checkpoint',
+                'checkpoint_every', 'resume', 'stream')
 
     def execute(self, source_code):
-        self.format.interpreter.run_mwot(source_code, **self.kwargs)
+        if not self.timings.enabled or self.kwargs.get('stream'):
+            # Streaming compiles and executes at once.
+            with self.timings.phase('execute'):
+                self.format.interpreter.run_mwot(source_code, **self.kwargs)
+            return
+        with self.timings.phase('compile'):
+            bits = bit_bytes(source_code)
+        with self.timings.phase('optimize'):
+            program = self.format.interpreter.Program.from_bits(bits)
+        self.run_timed(program)
 
 
 class Execute(InterpreterAction):
 
     stype_in = stypes.BYTES
-    keywords = ('shebang_in', 'cellsize', 'eof', 'totalcells', 'wraparound')
+    keywords = ('shebang_in', 'cellsize', 'eof', 'totalcells', 'wraparound',
+                'checkpoint', 'checkpoint_every', 'resume', 'stream')
 
     def execute(self, source_code):
-        self.format.interpreter.run(source_code, **self.kwargs)
+        if not self.timings.enabled or self.kwargs.get('stream'):
+            with self.timings.phase('execute'):
+                self.format.interpreter.run(source_code, **self.kwargs)
+            return
+        self.run_timed(source_code, self.kwargs.get('shebang_in', True))
@@ -1,11 +1,12 @@
 """Fancy argparse type conversion."""
 
 from ..compiler import bits_from_mwot
+from .. import decompilers
 from ..util import split
 
 truthies = {'true', 't', 'yes', 'y', '1'}
 falsies = {'false', 'f', 'no', 'n', '0'}
-decomps = {'basic', 'guide', 'rand'}
+decomps = set(decompilers.names)
 
 
 class ArgType:
@@ -89,6 +90,14 @@ def PosIntArg(val):
     return num
 
 
+@argtype('range')
+def RangeArg(val):
+    start, stop = map(int, val.split(':'))
+    if not 0 <= start <= stop:
+        raise ValueError('bad range')
+    return start, stop
+
+
 @argtype('vocab')
 def VocabArg(val):
     desired = (0, 1)
@@ -0,0 +1,137 @@
+"""Transpile many files at once, for `--output-dir`."""
+
+import os
+import sys
+import time
+import types
+
+from .parsing import Unspecified, defaults
+
+# Output file extensions by action and format, for `{ext}` in names
+extensions = {
+    ('compile', 'brainfuck'): 'b',
+    ('compile', 'binary'): 'bin',
+    ('decompile', 'brainfuck'): 'mwot',
+    ('decompile', 'binary'): 'mwot',
+}
+default_name = '{stem}.{ext}'
+
+
+def output_name(srcfile, template, action, format_):
+    """Fill in an output file name template for `srcfile`.
+
+    Fields: `{name}` (the source's file name), `{stem}` (the name
+    without its last extension) and `{ext}` (the usual extension of the
+    output, like `b` or `mwot`).
+    """
+    name = os.path.basename(srcfile)
+    stem = os.path.splitext(name)[0]
+    return template.format(name=name, stem=stem,
+                           ext=extensions[action, format_])
+
+
+def up_to_date(srcfile, outfile):
+    """Is `outfile` newer than `srcfile`?"""
+    try:
+        return os.stat(outfile).st_mtime_ns > os.stat(srcfile).st_mtime_ns
+    except OSError:
+        return False
+
+
+def run_batch(parsed):
+    """Transpile each SRCFILE into the output directory.
+
+    Files whose outputs are newer than them are skipped, and the rest
+    are spread over `parsed.jobs` worker processes. A line is printed
+    to stderr per file, then a summary. Returns the exit status.
+    """
+    template = parsed.name or default_name
+    outfiles = {}
+    for srcfile in parsed.srcfiles:
+        name = output_name(srcfile, template, parsed.action, parsed.format)
+        outfile = os.path.join(parsed.outdir, name)
+        if outfile in outfiles:
+            print(f'mwot: error: {outfiles[outfile]} and {srcfile} would '
+                  f'both be written to {outfile}', file=sys.stderr)
+            return 2
+        outfiles[outfile] = srcfile
+    os.makedirs(parsed.outdir, exist_ok=True)
+
+    pending = []
+    skipped = 0
+    for outfile, srcfile in outfiles.items():
+        if up_to_date(srcfile, outfile):
+            print(f'mwot: {srcfile}: up to date', file=sys.stderr)
+            skipped += 1
+        else:
+            pending.append((srcfile, outfile))
+
+    # Unspecified can't be sent to another process.
+    options = {key: value for key, value in vars(parsed).items()
+               if value is not Unspecified}
+    jobs = min(parsed.jobs or os.cpu_count() or 1, len(pending))
+    failed = 0
+    for srcfile, outfile, result in _run_jobs(options, pending, jobs):
+        if isinstance(result, Exception):
+            print(f'mwot: {srcfile}: error: {result}', file=sys.stderr)
+            failed += 1
+        else:
+            size, seconds = result
+            print(f'mwot: {srcfile} -> {outfile} ({size} bytes, '
+                  f'{seconds:.2f} s)', file=sys.stderr)
+    done = len(pending) - failed
+    print(f'mwot: {done} transpiled, {skipped} up to date, {failed} failed',
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _run_jobs(options, pending, jobs):
+    """Yield (srcfile, outfile, (size, seconds) or exception)."""
+    if jobs <= 1:
+        for srcfile, outfile in pending:
+            try:
+                result = transpile_file(options, srcfile, outfile)
+            except Exception as e:
+                result = e
+            yield srcfile, outfile, result
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    import multiprocessing
+
+    # Spawned workers are safe to start from threads (like under
+    # `mwot serve`), unlike forked ones.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(jobs, mp_context=context) as executor:
+        futures = {executor.submit(transpile_file, options, *job): job
+                   for job in pending}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = e
+            yield (*futures[future], result)
+
+
+def transpile_file(options, srcfile, outfile):
+    """Transpile one file with the options of a batch.
+
+    Returns the output's size and how long it took. If it fails, the
+    partial output is removed.
+    """
+    from . import dispatch
+
+    parsed = types.SimpleNamespace(**{**defaults, **options})
+    parsed.srcfile = srcfile
+    parsed.outfile = outfile
+    parsed.outdir = None
+    start = time.perf_counter()
+    try:
+        dispatch(parsed)
+    except BaseException:
+        try:
+            os.remove(outfile)
+        except OSError:
+            pass
+        raise
+    return os.path.getsize(outfile), time.perf_counter() - start
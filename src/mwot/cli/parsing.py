@@ -1,17 +1,19 @@
 """The `argparse`-based portion of the CLI."""
 
-import argparse
+import os
 import sys
+import types
 
 from .. import __version__
 from ..decompilers.common import default_vocab, default_width
 from .argtypes import (ArgUnion, BooleanArg, DecompilerArg, IntArg, NoneArg,
-                       PosIntArg, VocabArg)
+                       PosIntArg, RangeArg, VocabArg)
 
 description = """
 
 Usage:
   mwot -{c|d}{b|y} [OPTIONS] [SRCFILE]
+  mwot -{c|d}{b|y} [OPTIONS] --output-dir DIR SRCFILE...
   mwot -{i|x}b [OPTIONS] [SRCFILE]
 
 Transpile MWOT or execute brainfuck.
@@ -21,16 +23,103 @@ Transpile MWOT or execute brainfuck.
 epilog = """
 
 Available decompilers (-D):
-  basic      one word for 0, one word for 1
-  guide      guide to help you write MWOT
-  rand       random letters
+  basic       one word for 0, one word for 1
+  dictionary  random words from a word list (--words)
+  guide       guide to help you write MWOT
+  rand        random letters
 
 """
 
 Unspecified = object()  # Indicates that kwargs should not be passed
 
+# Defaults shared by the full parser and `parse_fast()`
+defaults = {
+    'source': None,
+    'outfile': '-',
+    'outdir': None,
+    'name': None,
+    'jobs': None,
+    'pipeline': False,
+    'shebang_out': False,
+    'executable_out': False,
+    'incremental': False,
+    'range': None,
+    'minify': False,
+    'decompiler': 'rand',
+    'vocab': Unspecified,
+    'words': Unspecified,
+    'width': Unspecified,
+    'cols': Unspecified,
+    'shebang_in': True,
+    'infile': '-',
+    'input': None,
+    'cellsize': Unspecified,
+    'eof': Unspecified,
+    'totalcells': Unspecified,
+    'wraparound': Unspecified,
+    'checkpoint': Unspecified,
+    'checkpoint_every': Unspecified,
+    'resume': Unspecified,
+    'stream': Unspecified,
+    'stats': None,
+    'timings': None,
+    'trace_memory': False,
+}
+fast_actions = {
+    'c': 'compile',
+    'd': 'decompile',
+    'i': 'interpret',
+    'x': 'execute',
+}
+fast_formats = {
+    'b': 'brainfuck',
+    'y': 'binary',
+}
+# Options that are paths, to resolve against another directory (see
+# `resolve_paths()`)
+path_dests = ('srcfile', 'outfile', 'outdir', 'infile', 'words',
+              'checkpoint', 'resume', 'stats', 'timings')
+
+
+def parse_fast(args):
+    """Parse `-{c|d|i|x}{b|y} SRCFILE` without building a parser.
+
+    This is the form used by shebang scripts, so it should start
+    quickly. Returns None for any other arguments.
+    """
+    if len(args) != 2:
+        return None
+    flags, srcfile = args
+    if (len(flags) != 3 or flags[0] != '-' or srcfile.startswith('-')
+            or flags[1] not in fast_actions or flags[2] not in fast_formats):
+        return None
+    action = fast_actions[flags[1]]
+    format_ = fast_formats[flags[2]]
+    if action in ('interpret', 'execute') and format_ != 'brainfuck':
+        return None
+    return types.SimpleNamespace(action=action, format=format_,
+                                 srcfile=srcfile, **defaults)
+
+
+def resolve_paths(parsed, cwd):
+    """Make the relative paths in parsed arguments relative to `cwd`."""
+    for dest in path_dests:
+        value = getattr(parsed, dest)
+        if value not in (None, '-', Unspecified):
+            setattr(parsed, dest, os.path.join(cwd, value))
+    if getattr(parsed, 'srcfiles', None):
+        parsed.srcfiles = [os.path.join(cwd, path)
+                           for path in parsed.srcfiles]
+
+
+def parse(args, cwd=None):
+    """Parse arguments with the full parser.
+
+    Relative paths are resolved against `cwd`, if given, before the
+    files are checked.
+    """
+    import argparse
 
-def parse(args):
     parser = argparse.ArgumentParser(
         prog='mwot',
         usage=argparse.SUPPRESS,
@@ -98,10 +187,12 @@ def parse(args):
         help='use binary (octets) format',
     )
     src_mx_opts.add_argument(
-        'srcfile',
+        'srcfiles',
         metavar='SRCFILE',
-        nargs='?',
-        help="source file (absent or '-' for stdin)",
+        nargs='*',
+        default=[],
+        help=("source file (absent or '-' for stdin); more than one needs "
+              "--output-dir"),
     )
     src_mx_opts.add_argument(
         '-e', '--source',
@@ -113,9 +204,57 @@ def parse(args):
         '-o', '--output-file',
         dest='outfile',
         metavar='OUTFILE',
-        default='-',
+        default=defaults['outfile'],
         help="output file (absent or '-' for stdout)",
     )
+    main_opts.add_argument(
+        '--output-dir',
+        dest='outdir',
+        metavar='DIR',
+        default=defaults['outdir'],
+        help=('(with -c or -d) transpile each SRCFILE to a file in DIR, '
+              'skipping those whose output is newer'),
+    )
+    main_opts.add_argument(
+        '--name',
+        metavar='TEMPLATE',
+        default=defaults['name'],
+        help=('(with --output-dir) output file name, from {name}, {stem} '
+              'and {ext} (default: {stem}.{ext})'),
+    )
+    main_opts.add_argument(
+        '-j', '--jobs',
+        metavar='N',
+        type=PosIntArg,
+        default=defaults['jobs'],
+        help=('(with --output-dir) transpile N files at a time (default: '
+              'the number of CPUs)'),
+    )
+    main_opts.add_argument(
+        '--pipeline',
+        action='store_true',
+        help=('read input and write output in separate threads, at the '
+              'same time as transpiling or executing'),
+    )
+    main_opts.add_argument(
+        '--timings',
+        action='store_const',
+        const='-',
+        default=defaults['timings'],
+        help=('report the time spent in each phase (reading, compiling, '
+              'executing, etc.) to stderr'),
+    )
+    main_opts.add_argument(
+        '--timings-file',
+        dest='timings',
+        metavar='FILE',
+        help='like --timings, but write the report to FILE as JSON',
+    )
+    main_opts.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='(with --timings) also trace each phase\'s peak memory (slow)',
+    )
     main_opts.add_argument(
         '--help',
         action='help',
@@ -138,12 +277,32 @@ def parse(args):
         action='store_true',
         help='(with -b or -cy) make output files executable',
     )
+    trans_opts.add_argument(
+        '-O', '--minify',
+        action='store_true',
+        help=('(with -b) shorten the brainfuck (and so the MWOT) without '
+              'changing what it does, and report the reduction'),
+    )
+    trans_opts.add_argument(
+        '--incremental',
+        action='store_true',
+        help=('(with -c) cache bits in SRCFILE.mwotc and only recompile '
+              'what changed'),
+    )
+    trans_opts.add_argument(
+        '--range',
+        metavar='START:STOP',
+        type=RangeArg,
+        default=defaults['range'],
+        help=('(with -c) only output bytes or instructions START to STOP, '
+              'seeking with an index kept in SRCFILE.mwoti'),
+    )
 
     decomp_opts.add_argument(
         '-D', '--decompiler',
         metavar='DECOMPILER',
         type=DecompilerArg,
-        default='rand',
+        default=defaults['decompiler'],
         help='decompiler to use (default: rand)',
     )
     default_vocab_str = repr(' '.join(default_vocab))
@@ -151,23 +310,30 @@ def parse(args):
         '--vocab',
         metavar='WORDS',
         type=VocabArg,
-        default=Unspecified,
+        default=defaults['vocab'],
         help=(f'(basic, guide) words for zero and one (default: '
               f'{default_vocab_str})'),
     )
+    decomp_opts.add_argument(
+        '--words',
+        metavar='WORDFILE',
+        default=defaults['words'],
+        help=('(dictionary) word list, one word per line with an optional '
+              'weight (default: a built-in list)'),
+    )
     decomp_opts.add_argument(
         '--width',
         metavar='WIDTH',
         type=ArgUnion(PosIntArg, NoneArg),
-        default=Unspecified,
-        help=(f"(basic, rand) wrap width ('none' for no wrapping) (default: "
-              f"{default_width})"),
+        default=defaults['width'],
+        help=(f"(basic, dictionary, rand) wrap width ('none' for no "
+              f"wrapping) (default: {default_width})"),
     )
     decomp_opts.add_argument(
         '--cols',
         metavar='COLS',
         type=PosIntArg,
-        default=Unspecified,
+        default=defaults['cols'],
         help="(guide) bits per row (default: 8)",
     )
 
@@ -183,7 +349,7 @@ def parse(args):
         '--input-file',
         dest='infile',
         metavar='INFILE',
-        default='-',
+        default=defaults['infile'],
         help="read input from INFILE (absent or '-' for stdin if possible)",
     )
     input_mx_opts.add_argument(
@@ -195,14 +361,14 @@ def parse(args):
         '--cellsize',
         metavar='BITS',
         type=ArgUnion(PosIntArg, NoneArg),
-        default=Unspecified,
+        default=defaults['cellsize'],
         help='bits per cell (default: 8)',
     )
     i_bf_opts.add_argument(
         '--eof',
         metavar='VAL',
         type=ArgUnion(IntArg, NoneArg),
-        default=Unspecified,
+        default=defaults['eof'],
         help=('int to read in after EOF (\'none\' for "no change" behavior) '
               '(default: none)'),
     )
@@ -210,16 +376,51 @@ def parse(args):
         '--totalcells',
         metavar='CELLS',
         type=ArgUnion(PosIntArg, NoneArg),
-        default=Unspecified,
-        help="total cells ('none' for dynamic size) (default: 30_000)",
+        default=defaults['totalcells'],
+        help=("total cells ('none' for dynamic size; huge sizes only use "
+              "memory for the pages written to) (default: 30_000)"),
     )
     i_bf_opts.add_argument(
         '--wraparound',
         metavar='BOOL',
         type=BooleanArg,
-        default=Unspecified,
+        default=defaults['wraparound'],
         help='whether the cell pointer can overflow (default: true)',
     )
+    i_bf_opts.add_argument(
+        '--checkpoint',
+        metavar='FILE',
+        default=defaults['checkpoint'],
+        help=('save snapshots of the program state to FILE (on SIGUSR1, '
+              'SIGTERM, or with --checkpoint-every)'),
+    )
+    i_bf_opts.add_argument(
+        '--checkpoint-every',
+        metavar='STEPS',
+        type=PosIntArg,
+        default=defaults['checkpoint_every'],
+        help='(with --checkpoint) save a snapshot every STEPS steps',
+    )
+    i_bf_opts.add_argument(
+        '--resume',
+        metavar='FILE',
+        default=defaults['resume'],
+        help='resume from a snapshot saved with --checkpoint',
+    )
+    i_bf_opts.add_argument(
+        '--stream',
+        action='store_true',
+        default=defaults['stream'],
+        help=('compile as the program runs, so output starts sooner (bracket '
+              'errors are only found when reached)'),
+    )
+    i_bf_opts.add_argument(
+        '--stats',
+        metavar='FILE',
+        default=defaults['stats'],
+        help=('write interpreter counters to FILE at exit (Prometheus text '
+              'format if FILE ends in .prom, else JSON)'),
+    )
 
     if not args:
         parser.print_help()
@@ -228,10 +429,77 @@ def parse(args):
     parsed = parser.parse_args(args)
 
     # Manually add some restrictions and adjustments.
-    if parsed.srcfile is None:
-        parsed.srcfile = '-'
+    parsed.srcfile = parsed.srcfiles[0] if parsed.srcfiles else '-'
+    if cwd is not None:
+        resolve_paths(parsed, cwd)
+    if parsed.outdir is None:
+        if len(parsed.srcfiles) > 1:
+            parser.error('more than one SRCFILE requires --output-dir')
+        for option, dest in (('--name', 'name'), ('-j/--jobs', 'jobs')):
+            if getattr(parsed, dest) is not None:
+                parser.error(f'{option} requires --output-dir')
+    else:
+        if parsed.action not in ('compile', 'decompile'):
+            parser.error('--output-dir requires -c or -d')
+        if parsed.source is not None or not parsed.srcfiles:
+            parser.error('--output-dir requires SRCFILE')
+        if '-' in parsed.srcfiles:
+            parser.error("--output-dir can't read stdin ('-')")
+        if parsed.outfile != '-':
+            parser.error('--output-dir and -o are mutually exclusive')
+        if parsed.range is not None:
+            parser.error('--output-dir cannot be used with --range')
+        if parsed.name is not None:
+            try:
+                parsed.name.format(name='', stem='', ext='')
+            except (KeyError, IndexError, ValueError) as e:
+                parser.error(f'bad --name template: {e!r}')
     if parsed.action in ('interpret', 'execute'):
         if parsed.format != 'brainfuck':
             parser.error(f'cannot execute {parsed.format}')
+        if parsed.resume is not Unspecified:
+            # The output is continued in place.
+            if not os.path.isfile(parsed.resume):
+                parser.error(f'--resume: no such snapshot: {parsed.resume}')
+            if parsed.outfile != '-' and not os.path.isfile(parsed.outfile):
+                parser.error(f'--resume: no such output file to continue: '
+                             f'{parsed.outfile}')
+    for option, dest in (('--incremental', 'incremental'),
+                         ('--range', 'range')):
+        if getattr(parsed, dest) in (None, False):
+            continue
+        if parsed.action != 'compile':
+            parser.error(f'{option} requires -c')
+        if parsed.source is not None or parsed.srcfile == '-':
+            parser.error(f'{option} requires SRCFILE')
+    if parsed.incremental and parsed.range is not None:
+        parser.error('--incremental and --range are mutually exclusive')
+    if parsed.words is not Unspecified:
+        from ..decompilers import dictionary
+
+        # Load it now (it's cached) to report any problem as usual.
+        try:
+            dictionary.load(parsed.words)
+        except OSError as e:
+            parser.error(f'--words: {e.strerror}: {parsed.words}')
+        except ValueError as e:
+            parser.error(f'--words: {parsed.words}: {e}')
+    if parsed.minify:
+        if parsed.action not in ('compile', 'decompile'):
+            parser.error('--minify requires -c or -d')
+        if parsed.format != 'brainfuck':
+            parser.error('--minify requires -b')
+    if parsed.trace_memory and parsed.timings is None:
+        parser.error('--trace-memory requires --timings')
+    if parsed.timings is not None:
+        if parsed.pipeline:
+            parser.error('--timings cannot be used with --pipeline')
+        if parsed.outdir is not None:
+            parser.error('--timings cannot be used with --output-dir')
+    for option, dest in (('--pipeline', 'pipeline'), ('--minify', 'minify')):
+        if getattr(parsed, dest) and (parsed.incremental
+                                      or parsed.range is not None):
+            parser.error(f'{option} cannot be used with --incremental or '
+                         f'--range')
 
     return parser, parsed
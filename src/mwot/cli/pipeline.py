@@ -0,0 +1,242 @@
+"""Background reader and writer threads, for `--pipeline`.
+
+The reader and writer hand blocks to and from the main thread (which
+transpiles or executes) through bounded queues, so each side waits for
+the other only when it gets `depth` blocks ahead.
+"""
+
+import codecs
+from collections import deque
+import io
+import os
+import queue
+import threading
+
+from ..join import default_bufsize
+
+default_depth = 16  # Blocks queued between stages
+# Seconds between checks for `Reader.close()` while the queue is full
+poll_interval = 0.05
+
+_done = object()  # End of a queue
+
+
+class Reader:
+    """Read a file in a background thread.
+
+    Iterate for the blocks read, or use `read()` like a file.
+    Exceptions from reading are raised in the consuming thread.
+    """
+
+    def __init__(self, f, bufsize=default_bufsize, depth=default_depth):
+        self._file = f
+        self._bufsize = bufsize
+        self._queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._error = None
+        self._block = f.read(0)  # Empty, of the right type
+        self._pos = 0
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        block = self._next_block()
+        if block is None:
+            raise StopIteration
+        return block
+
+    def _run(self):
+        try:
+            for block in read_blocks(self._file, self._bufsize):
+                if not self._put(block):
+                    return
+        except Exception as e:
+            self._error = e
+        finally:
+            self._put(_done)
+
+    def _put(self, item):
+        """Queue `item`, or return False if reading has been stopped.
+
+        The queue might never have room again once the consumer stops,
+        so this doesn't wait on it forever.
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=poll_interval)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _next_block(self):
+        """Get the next unread block (or the rest of one), or None."""
+        if self._pos < len(self._block):
+            block = self._block[self._pos:]
+            self._pos = len(self._block)
+            return block
+        if self._eof:
+            return None
+        block = self._queue.get()
+        if block is _done:
+            self._eof = True
+            if self._error is not None:
+                raise self._error
+            return None
+        self._block = block
+        self._pos = len(block)
+        return block
+
+    def read(self, size=-1):
+        """Read up to `size` items (or everything if negative)."""
+        if size is None or size < 0:
+            return self._block[:0].join(iter(self._next_block, None))
+        if self._pos >= len(self._block) and self._next_block() is not None:
+            self._pos = 0  # Put the new block back.
+        chunk = self._block[self._pos:self._pos + size]
+        self._pos += len(chunk)
+        return chunk
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        """Stop reading. Doesn't close the file."""
+        self._stop.set()
+        # Make room in case the thread is waiting on a full queue.
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+def read_blocks(f, bufsize=default_bufsize):
+    """Yield blocks from `f` as soon as they're available.
+
+    Real files are read through their descriptors, so `f` can be
+    closed while a read is blocked (say, on a terminal).
+    """
+    try:
+        fd = f.fileno()
+    except (AttributeError, OSError, ValueError):
+        fd = None
+    if fd is None:
+        read = getattr(f, 'read1', f.read)
+        while block := read(bufsize):
+            yield block
+        return
+    decoder = None
+    if isinstance(f, io.TextIOBase):
+        decoder = codecs.getincrementaldecoder(f.encoding)(f.errors)
+    while True:
+        data = os.read(fd, bufsize)
+        block = data if decoder is None else decoder.decode(data, not data)
+        if block:
+            yield block
+        elif not data:
+            return
+
+
+class Writer:
+    """Write to a file in a background thread.
+
+    Writes made while the thread is busy are batched together, and
+    `write()` waits when `depth` blocks' worth are pending. The file is
+    flushed whenever the thread catches up, so `flush()` doesn't wait.
+    An exception from writing (like `BrokenPipeError`) is raised by the
+    next `write()`, `flush()` or `close()`.
+    """
+
+    def __init__(self, f, depth=default_depth, bufsize=default_bufsize):
+        self._file = f
+        self._max_pending = depth * bufsize
+        self._pending = deque()
+        # Each count is only changed by one thread.
+        self._written = 0
+        self._drained = 0
+        self._ready = threading.Condition()
+        self._idle = False
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't hide the original error.
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        pending = self._pending
+        ready = self._ready
+        while True:
+            with ready:
+                self._idle = True
+                while not pending and not self._closed:
+                    ready.wait()
+                self._idle = False
+            if not pending:
+                return
+            batch = [pending.popleft() for _ in range(len(pending))]
+            data = batch[0][:0].join(batch)
+            if self._error is None:
+                try:
+                    self._file.write(data)
+                    if not pending:
+                        self._file.flush()
+                except Exception as e:
+                    self._error = e
+            with ready:
+                self._drained += len(data)
+                ready.notify_all()
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, data):
+        self._check()
+        self._pending.append(data)
+        self._written += len(data)
+        if self._idle or self._written - self._drained > self._max_pending:
+            with self._ready:
+                self._ready.notify_all()
+                while self._written - self._drained > self._max_pending:
+                    self._ready.wait()
+        return len(data)
+
+    def flush(self):
+        self._check()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        """Finish writing. Doesn't close the file."""
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+        self._thread.join()
+        self._check()
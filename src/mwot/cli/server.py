@@ -0,0 +1,222 @@
+"""A warm `mwot` process that serves CLI invocations over a Unix socket.
+
+The client sends its arguments and working directory along with its
+stdin, stdout and stderr file descriptors, so the server reads and
+writes the client's streams directly. Each request is served in its own
+thread (so pipelines of `mwot`s work) with its own standard streams,
+and shares the server's caches, like compiled brainfuck programs.
+"""
+
+from array import array
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import threading
+import traceback
+
+fd_count = 3  # stdin, stdout, stderr
+
+
+class ThreadStreams:
+    """Stand-in for a standard stream that is different per thread."""
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    # Special methods aren't looked up through __getattr__.
+    def __enter__(self):
+        return self.get().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.get().__exit__(*exc_info)
+
+    def __iter__(self):
+        return iter(self.get())
+
+    def get(self):
+        """Get this thread's stream."""
+        return getattr(self._local, 'stream', self._default)
+
+    def set(self, stream):
+        """Set this thread's stream (None for the default)."""
+        self._local.stream = self._default if stream is None else stream
+
+
+def default_path():
+    """Get the socket path from $MWOT_SOCKET, or a per-user default."""
+    path = os.environ.get('MWOT_SOCKET')
+    if path:
+        return path
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'mwot.sock')
+    return f'/tmp/mwot-{os.getuid()}.sock'
+
+
+def forward(args, path=None):
+    """Run `mwot args` on the server and return its exit status.
+
+    Returns None if no server is listening.
+    """
+    if path is None:
+        path = default_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+            request = json.dumps({'args': args, 'cwd': os.getcwd()})
+            data = f'{request}\n'.encode()
+            fds = array('i', range(fd_count))
+            sent = sock.sendmsg(
+                [data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds)])
+            if sent < len(data):
+                sock.sendall(data[sent:])
+        except OSError:
+            # No server, or a dead one: run locally instead.
+            return None
+        with sock.makefile('rb') as f:
+            reply = f.readline()
+    return int(reply) if reply else 1
+
+
+def serve(path=None):
+    """Serve requests forever."""
+    if path is None:
+        path = default_path()
+    error = remove_stale(path)
+    if error is not None:
+        print('usage: mwot serve [SOCKET]', file=sys.stderr)
+        print(f'mwot serve: error: {error}', file=sys.stderr)
+        sys.exit(2)
+    streams = [ThreadStreams(stream)
+               for stream in (sys.stdin, sys.stdout, sys.stderr)]
+    sys.stdin, sys.stdout, sys.stderr = streams
+    # Remove the socket on SIGTERM too.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        mask = os.umask(0o077)  # Only this user may connect.
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(mask)
+        sock.listen()
+        try:
+            while True:
+                conn, _ = sock.accept()
+                thread = threading.Thread(target=handle, args=(conn,),
+                                          daemon=True)
+                thread.start()
+        finally:
+            os.unlink(path)
+
+
+def remove_stale(path):
+    """Remove a socket left over from a server that's gone.
+
+    Returns an error message instead if something else is at `path`,
+    or a server is still listening there.
+    """
+    try:
+        st_mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return None
+    if not stat.S_ISSOCK(st_mode):
+        return f'{path} exists and is not a socket'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return None
+        except OSError as e:
+            return f'{path}: {e.strerror}'
+    return f'a server is already listening on {path}'
+
+
+def handle(conn):
+    """Serve one request."""
+    from ..brainfuck.interpreter import Stopper, stop_with
+
+    with conn:
+        fd_size = array('i').itemsize * fd_count
+        data, ancdata, _, _ = conn.recvmsg(1 << 16,
+                                           socket.CMSG_SPACE(fd_size))
+        fds = array('i')
+        for level, kind, cmsg_data in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                usable = len(cmsg_data) - len(cmsg_data) % fds.itemsize
+                fds.frombytes(cmsg_data[:usable])
+        try:
+            while not data.endswith(b'\n'):
+                chunk = conn.recv(1 << 16)
+                if not chunk:
+                    return
+                data += chunk
+            if len(fds) != fd_count:
+                return
+            request = json.loads(data)
+            stopper = Stopper()
+            watcher = threading.Thread(target=watch, args=(conn, stopper),
+                                       daemon=True)
+            watcher.start()
+            with stop_with(stopper):
+                status = run_request(request['args'], request['cwd'], fds)
+            conn.sendall(f'{status}\n'.encode())
+        except OSError:
+            pass  # The client is gone.
+        finally:
+            for fd in fds:
+                os.close(fd)
+            try:
+                conn.shutdown(socket.SHUT_RDWR)  # Wakes the watcher
+            except OSError:
+                pass
+
+
+def watch(conn, stopper):
+    """Stop a request's brainfuck once its client hangs up.
+
+    Clients send nothing after the request, so anything but more data
+    means it's gone (or the request is done).
+    """
+    try:
+        while conn.recv(1 << 10):
+            pass
+    except OSError:
+        pass
+    stopper.stop()
+
+
+def run_request(args, cwd, fds):
+    """Run the CLI with the client's directory and streams."""
+    from . import dispatch, parse_args
+
+    streams = [open(fd, mode, closefd=False)
+               for fd, mode in zip(fds, ('r', 'w', 'w'))]
+    for proxy, stream in zip((sys.stdin, sys.stdout, sys.stderr), streams):
+        proxy.set(stream)
+    try:
+        parsed = parse_args(args, cwd)
+        status = dispatch(parsed) or 0
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else int(bool(e.code))
+        if e.code is not None and not isinstance(e.code, int):
+            print(e.code, file=sys.stderr)
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        for stream in streams:
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        for proxy in (sys.stdin, sys.stdout, sys.stderr):
+            proxy.set(None)
+    return status
@@ -0,0 +1,149 @@
+"""Per-phase timing for `--timings`."""
+
+from contextlib import contextmanager
+import json
+import sys
+import time
+
+from ..join import Joinable
+
+
+class Timings:
+    """Time spent in each phase of a CLI action.
+
+    Phases can nest; each one's time excludes the phases inside it.
+    Without `--timings`, actions use `actions.NoTimings` instead.
+
+    With `trace_memory`, `tracemalloc` records each phase's peak
+    allocation, which slows everything down.
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.seconds = {}
+        self.peaks = {}
+        self._stack = []
+        self._started = time.perf_counter()
+        self._since = self._started
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+
+    def _switch(self):
+        """Charge the time (and memory) since the last switch."""
+        now = time.perf_counter()
+        if self._stack:
+            name = self._stack[-1]
+            self.seconds[name] = self.seconds.get(name, 0.0) + (
+                now - self._since)
+            if self.trace_memory:
+                import tracemalloc
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peaks[name] = max(self.peaks.get(name, 0), peak)
+                if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+                    tracemalloc.reset_peak()
+        self._since = now
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager to time a phase called `name`."""
+        self._switch()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._switch()
+            self._stack.pop()
+
+    def finish(self, name, joinable):
+        """Run a lazy `Joinable` to completion now, as a phase.
+
+        Otherwise, its work would be done by whichever phase consumes
+        it. Returns an equivalent `Joinable`.
+        """
+        with self.phase(name):
+            joined = joinable.join()
+        return Joinable(iter(joined), joinable.seq_type,
+                        length_hint=len(joined))
+
+    def file(self, f, name):
+        """Wrap a file so that its reads and writes are a phase."""
+        return TimedFile(f, self, name)
+
+    def as_dict(self):
+        """The timings (and peaks), as a dict."""
+        total = time.perf_counter() - self._started
+        phases = {}
+        for name, seconds in self.seconds.items():
+            phases[name] = {'seconds': seconds}
+            if name in self.peaks:
+                phases[name]['peak_bytes'] = self.peaks[name]
+        info = {
+            'phases': phases,
+            'other_seconds': total - sum(self.seconds.values()),
+            'total_seconds': total,
+        }
+        max_rss = _max_rss()
+        if max_rss is not None:
+            info['max_rss_bytes'] = max_rss
+        return info
+
+    def report(self, path='-'):
+        """Print a breakdown to stderr, or write it as JSON to `path`."""
+        info = self.as_dict()
+        if path != '-':
+            with open(path, 'wt') as f:
+                json.dump(info, f, indent=2)
+                f.write('\n')
+            return
+        lines = ['mwot: timings:']
+        rows = [(name, phase['seconds'], phase.get('peak_bytes'))
+                for name, phase in info['phases'].items()]
+        rows.append(('other', info['other_seconds'], None))
+        rows.append(('total', info['total_seconds'], None))
+        for name, seconds, peak in rows:
+            line = f'  {name:<10} {seconds:9.3f} s'
+            if peak is not None:
+                line += f'  (peak {peak / (1 << 20):.1f} MiB)'
+            lines.append(line)
+        if 'max_rss_bytes' in info:
+            lines.append(f"  max RSS {info['max_rss_bytes'] / (1 << 20):.1f} "
+                         f"MiB")
+        print('\n'.join(lines), file=sys.stderr)
+
+
+class TimedFile:
+    """File wrapper whose reads, writes and flushes are a phase."""
+
+    def __init__(self, f, timings, name):
+        self._file = f
+        self._phase = timings.phase
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def read(self, *args):
+        with self._phase(self._name):
+            return self._file.read(*args)
+
+    def write(self, data):
+        with self._phase(self._name):
+            return self._file.write(data)
+
+    def flush(self):
+        with self._phase(self._name):
+            return self._file.flush()
+
+
+def _max_rss():
+    """Peak resident memory of this process in bytes, if known."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
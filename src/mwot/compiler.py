@@ -1,8 +1,20 @@
 """Turn MWOT into bits."""
 
+from functools import lru_cache
+import re
+
 from .join import joinable
 from . import stypes
-from .util import deshebang, split
+from .util import deshebang, numpy_backend, split
+
+# Matches whitespace-separated words, like `util.split()`
+word_pattern = re.compile(r'\S+')
+# Matches UTF-8 words separated by ASCII whitespace (see
+# `bits_from_byte_words()` for the rest)
+byte_word_pattern = re.compile(rb'[^\t-\r\x1c-\x20]+')
+word_cache_size = 1 << 16  # Distinct words to remember the bits of
+# ASCII characters that don't satisfy `str.isalpha()`
+_ascii_non_letters = bytes(i for i in range(128) if not chr(i).isalpha())
 
 
 @joinable()
@@ -11,16 +23,191 @@ def bits_from_mwot(mwot):
 
     Yields the even/oddness of the letter count of each
     whitespace-separated word, ignoring words with 0 letters.
+
+    Byte strings are read as UTF-8, decoding only the words that
+    aren't ASCII.
     """
     stype, mwot = stypes.probe(mwot, default=stypes.TEXT)
-    if stype is not stypes.TEXT:
-        raise TypeError('mwot must be text')
-    for word in split(deshebang(mwot, stype)):
-        length = letter_count(word)
-        if length:
-            yield length & 1
+    if stype is stypes.BYTES:
+        if stypes.ask(mwot) is None:
+            mwot = bytes(mwot)
+        bits = _vectorized_bits(mwot)
+        if bits is not None:
+            yield from bits.tolist()
+            return
+        matches = byte_word_pattern.finditer(mwot, shebang_end(mwot))
+        yield from bits_from_byte_words(match.group() for match in matches)
+        return
+    if isinstance(mwot, str):
+        bits = _vectorized_bits(mwot)
+        if bits is not None:
+            yield from bits.tolist()
+            return
+        # Scan whole strings in place.
+        matches = word_pattern.finditer(mwot, shebang_end(mwot))
+        words = (match.group() for match in matches)
+    else:
+        words = split(deshebang(mwot, stype))
+    yield from bits_from_words(words)
+
+
+def bit_bytes(mwot):
+    """Get the MWOT bits of MWOT source as `bytes` of 0s and 1s.
+
+    Like `bytes(bits_from_mwot(mwot))`, but big strings go straight
+    from the NumPy backend, without a Python int per bit.
+    """
+    stype, mwot = stypes.probe(mwot, default=stypes.TEXT)
+    if stype is stypes.BYTES and stypes.ask(mwot) is None:
+        mwot = bytes(mwot)
+    if stype is stypes.BYTES or isinstance(mwot, str):
+        bits = _vectorized_bits(mwot)
+        if bits is not None:
+            return bits.tobytes()
+    return bytes(bits_from_mwot(mwot))
+
+
+def _vectorized_bits(mwot):
+    """Get a whole string's bits (after any shebang) as a NumPy array.
+
+    Returns None if the NumPy backend isn't worth using, or isn't
+    available.
+    """
+    start = shebang_end(mwot)
+    backend = numpy_backend(len(mwot) - start)
+    if backend is None:
+        return None
+    if isinstance(mwot, str):
+        return backend.bits_from_text(mwot, start)
+    return backend.bits_from_utf8(mwot, start)
+
+
+@joinable()
+def bits_from_blocks(blocks):
+    """Like `bits_from_mwot()`, but for an iterable of blocks.
+
+    The blocks can be `str` or UTF-8 `bytes`. Words (and characters)
+    split between blocks are put back together. Big blocks use the
+    NumPy backend, if it's available.
+    """
+    blocks = iter(blocks)
+    text = None
+    for block in blocks:
+        text = block if text is None else text + block
+        if len(text) >= 2:
+            break
+    if text is None:
+        return
+    if isinstance(text, str):
+        shebang, newline = '#!', '\n'
+        pattern, trailing_pattern = word_pattern, _trailing_word_pattern
+        from_words = bits_from_words
+        vectorized = 'bits_from_text'
+    else:
+        shebang, newline = b'#!', b'\n'
+        pattern = byte_word_pattern
+        trailing_pattern = _trailing_byte_word_pattern
+        from_words = bits_from_byte_words
+        vectorized = 'bits_from_utf8'
+    # Skip a shebang line, however many blocks it spans.
+    if text.startswith(shebang):
+        while newline not in text:
+            text = next(blocks, None)
+            if text is None:
+                return
+        text = text[text.index(newline) + 1:]
+
+    def bits_before(end):
+        backend = numpy_backend(end)
+        if backend is not None:
+            return getattr(backend, vectorized)(text[:end]).tolist()
+        matches = pattern.finditer(text, 0, end)
+        return from_words(match.group() for match in matches)
+
+    for block in blocks:
+        text += block
+        partial = trailing_pattern.search(text)
+        end = len(text) if partial is None else partial.start()
+        yield from bits_before(end)
+        text = text[end:]
+    yield from bits_before(len(text))
+
+
+_trailing_word_pattern = re.compile(r'\S+\Z')
+_trailing_byte_word_pattern = re.compile(rb'[^\t-\r\x1c-\x20]+\Z')
+# A shebang line in a byte string
+_byte_shebang_pattern = re.compile(rb'#![^\n]*\n?')
+
+
+def bits_from_words(words):
+    """Yield MWOT bits from whitespace-separated words."""
+    for bit in map(word_bit, words):
+        if bit is not None:
+            yield bit
+
+
+def bits_from_byte_words(words):
+    """Yield MWOT bits from UTF-8 words split on ASCII whitespace.
+
+    Words that aren't ASCII are decoded, and split again in case they
+    have any non-ASCII whitespace.
+    """
+    for word in words:
+        if word.isascii():
+            bit = word_bit(word)
+            if bit is not None:
+                yield bit
+        else:
+            yield from bits_from_words(str(word, 'utf-8').split())
+
+
+@lru_cache(maxsize=word_cache_size)
+def word_bit(word):
+    """Get the MWOT bit of `word`, or None if it has no letters.
+
+    Prose repeats its words a lot, so the most recent
+    `word_cache_size` are cached. `word_bit.cache_info()` has the hit
+    and miss counts.
+    """
+    length = letter_count(word)
+    return length & 1 if length else None
 
 
 def letter_count(word):
-    """How many charaters in `word` satisfy `str.isalpha()`?"""
-    return sum(map(str.isalpha, word))
+    """How many charaters in `word` satisfy `str.isalpha()`?
+
+    `word` can also be ASCII `bytes`.
+    """
+    if isinstance(word, str):
+        if not word.isascii():
+            return sum(map(str.isalpha, word))
+        word = word.encode('ascii')
+    return len(word.translate(None, _ascii_non_letters))
+
+
+def located_bits(mwot, pos=0, endpos=None):
+    """Yield (offset, bit) for each word in `mwot[pos:endpos]`.
+
+    `mwot` must be a `str`. Unlike `bits_from_mwot()`, no shebang is
+    removed; use `shebang_end()` as `pos` for that.
+    """
+    if endpos is None:
+        endpos = len(mwot)
+    for match in word_pattern.finditer(mwot, pos, endpos):
+        bit = word_bit(match.group())
+        if bit is not None:
+            yield match.start(), bit
+
+
+def shebang_end(mwot):
+    """Get the offset just past a leading shebang line (or 0).
+
+    `mwot` can be a `str` or a byte string.
+    """
+    if not isinstance(mwot, str):
+        match = _byte_shebang_pattern.match(mwot)
+        return 0 if match is None else match.end()
+    if not mwot.startswith('#!'):
+        return 0
+    newline = mwot.find('\n')
+    return len(mwot) if newline < 0 else newline + 1
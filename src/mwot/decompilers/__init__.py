@@ -1,5 +1,12 @@
 """Converters from MWOT bits to MWOT source."""
 
-from . import basic
-from . import guide
-from . import rand
+import importlib
+
+# Decompiler modules, loaded on first use
+names = ('basic', 'dictionary', 'guide', 'rand')
+
+
+def __getattr__(name):
+    if name in names:
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
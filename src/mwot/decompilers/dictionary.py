@@ -0,0 +1,134 @@
+"""Decompile to words from a word list."""
+
+from functools import lru_cache
+import os
+import random
+
+from ..compiler import letter_count
+from .common import default_width, wrap_words
+
+# Used when no word list is given
+default_words = (
+    'a about after all also an and any are as at back be because but by '
+    'can come could day do even first for from get give go good have he '
+    'her him his how i if in into is it its just know like look make me '
+    'most my new no not now of on one only or other our out over people '
+    'say see she so some take than that the their them then there these '
+    'they think this time to two up us use want way we well what when '
+    'which who will with work would year you your'
+).split()
+
+
+class WordIndex:
+    """Words bucketed by the even/oddness of their letter counts.
+
+    Picking a word for a bit takes constant time, weighted or not.
+    Words with no letters are ignored.
+    """
+
+    def __init__(self, words, weights=None):
+        if weights is None:
+            weights = [1] * len(words)
+        buckets = ([], [])
+        bucket_weights = ([], [])
+        for word, weight in zip(words, weights):
+            length = letter_count(word)
+            if length and weight > 0:
+                buckets[length & 1].append(word)
+                bucket_weights[length & 1].append(weight)
+        for bit, bucket in enumerate(buckets):
+            if not bucket:
+                parity = ('even', 'odd')[bit]
+                raise ValueError(f'no words with an {parity} letter count')
+        self.buckets = buckets
+        # Unweighted buckets don't need alias tables.
+        self.tables = tuple(
+            None if len(set(weights)) == 1 else _alias_table(weights)
+            for weights in bucket_weights
+        )
+
+    @classmethod
+    def from_lines(cls, lines):
+        """Read a word list: one word per line, with an optional weight."""
+        words = []
+        weights = []
+        for line_number, line in enumerate(lines, 1):
+            fields = line.split()
+            if not fields:
+                continue
+            if len(fields) > 2:
+                raise ValueError(f'bad word list line {line_number}')
+            try:
+                weight = float(fields[1]) if len(fields) == 2 else 1
+            except ValueError:
+                raise ValueError(f'bad weight on word list line '
+                                 f'{line_number}') from None
+            words.append(fields[0])
+            weights.append(weight)
+        return cls(words, weights)
+
+    def choose(self, bit):
+        """Pick a random word for `bit`."""
+        bucket = self.buckets[bit]
+        i = int(random.random() * len(bucket))
+        table = self.tables[bit]
+        if table is not None:
+            probs, aliases = table
+            if random.random() >= probs[i]:
+                i = aliases[i]
+        return bucket[i]
+
+
+def load(path):
+    """Load a word list file, reusing it until the file changes."""
+    return _load(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _load(path, mtime_ns):
+    with open(path, 'rt') as f:
+        return WordIndex.from_lines(f)
+
+
+@lru_cache(maxsize=None)
+def default_index():
+    """Get the `WordIndex` of `default_words`."""
+    return WordIndex(default_words)
+
+
+def decomp(bits, words=None, width=default_width, **_):
+    """Decompile to random words with the right letter counts.
+
+    `words` can be a `WordIndex` or the path of a word list file (see
+    `WordIndex.from_lines()`). By default, `default_words` is used.
+    """
+    if words is None:
+        index = default_index()
+    elif isinstance(words, WordIndex):
+        index = words
+    else:
+        index = load(words)
+    return wrap_words(map(index.choose, bits), width=width)
+
+
+def _alias_table(weights):
+    """Build Vose's alias tables for constant-time weighted choice.
+
+    Returns (`probs`, `aliases`): pick `i` uniformly, then keep it with
+    probability `probs[i]`, else take `aliases[i]`.
+    """
+    n = len(weights)
+    total = sum(weights)
+    scaled = [weight * n / total for weight in weights]
+    probs = [1.0] * n
+    aliases = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        less = small.pop()
+        more = large.pop()
+        probs[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] -= 1 - scaled[less]
+        (small if scaled[more] < 1 else large).append(more)
+    return probs, aliases
@@ -0,0 +1,202 @@
+"""Incremental compilation: reuse the bits of unchanged MWOT.
+
+A compiled source's bits are cached with checkpoints, word offsets
+paired with bit indices. Each span between checkpoints is a block,
+which is hashed. On recompilation, blocks that are unchanged at the
+start and end of the new source are reused, and only the rest is
+compiled.
+"""
+
+import base64
+import hashlib
+import json
+
+from .compiler import located_bits, shebang_end
+
+version = 1
+default_interval = 1024  # Bits per block
+
+
+def digest(text):
+    """Hash a block of source."""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def pack_bits(bits):
+    """Pack a bytes-like of 0s and 1s into (bit count, packed bytes)."""
+    if not bits:
+        return 0, b''
+    number = int(bytes(bits).translate(_bit_digits), 2)
+    return len(bits), number.to_bytes(-(-len(bits) // 8), 'big')
+
+
+def unpack_bits(nbits, packed):
+    """Unpack `pack_bits()` output into a bytearray of 0s and 1s."""
+    if not nbits:
+        return bytearray()
+    digits = bin(int.from_bytes(packed, 'big'))[2:].zfill(nbits)
+    return bytearray(digits.encode().translate(_bit_values))
+
+
+_bit_digits = bytes.maketrans(b'\0\1', b'01')
+_bit_values = bytes.maketrans(b'01', b'\0\1')
+
+
+class BitCache:
+    """Compiled bits of a source, with checkpoints into it."""
+
+    def __init__(self, length, bits, checkpoints, digests,
+                 interval=default_interval, output=None):
+        self.length = length
+        self.bits = bits
+        self.checkpoints = checkpoints
+        self.digests = digests
+        self.interval = interval
+        self.output = output
+
+    @classmethod
+    def load(cls, path):
+        """Load a cache file, or return None if it's missing or stale."""
+        try:
+            with open(path, 'rt') as f:
+                data = json.load(f)
+            if data['version'] != version:
+                return None
+            bits = unpack_bits(data['nbits'], base64.b64decode(data['bits']))
+            return cls(
+                length=data['length'],
+                bits=bits,
+                checkpoints=[tuple(i) for i in data['checkpoints']],
+                digests=data['digests'],
+                interval=data['interval'],
+                output=data['output'],
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, path):
+        """Write the cache file."""
+        nbits, packed = pack_bits(self.bits)
+        data = {
+            'version': version,
+            'length': self.length,
+            'nbits': nbits,
+            'bits': base64.b64encode(packed).decode(),
+            'checkpoints': self.checkpoints,
+            'digests': self.digests,
+            'interval': self.interval,
+            'output': self.output,
+        }
+        with open(path, 'wt') as f:
+            json.dump(data, f)
+
+    def blocks(self):
+        """Yield (start, end, bit_start, bit_end, digest) per block."""
+        bounds = self.checkpoints[1:] + [(self.length, len(self.bits))]
+        for (start, bit_start), (end, bit_end), block_digest in zip(
+                self.checkpoints, bounds, self.digests):
+            yield start, end, bit_start, bit_end, block_digest
+
+
+def recompile(mwot, cache=None, interval=default_interval):
+    """Compile a `str` of MWOT, reusing what's unchanged in `cache`.
+
+    Returns (`new_cache`, `first_changed`), where `first_changed` is
+    the index of the first bit that differs from the cached bits.
+    """
+    if cache is None or cache.interval != interval:
+        new_cache = _compile_span(mwot, 0, len(mwot), interval=interval)
+        return new_cache, 0
+    blocks = list(cache.blocks())
+    sb_end = shebang_end(mwot)
+
+    # Reuse unchanged blocks at the start.
+    n_head = 0
+    for start, end, _, _, block_digest in blocks:
+        text = mwot[start:end]
+        if (end > len(mwot) or end < sb_end or digest(text) != block_digest
+                or not (end == len(mwot) or text[-1:].isspace())):
+            break
+        n_head += 1
+    if n_head == len(blocks) and cache.length == len(mwot):
+        return cache, len(cache.bits)
+    head_end, head_bits = (blocks[n_head][0], blocks[n_head][2]) if (
+        n_head < len(blocks)) else (cache.length, len(cache.bits))
+
+    # Reuse unchanged blocks at the end.
+    shift = len(mwot) - cache.length
+    first_allowed = max(head_end, sb_end, 1)
+    n_tail = 0
+    for start, end, _, _, block_digest in reversed(blocks[n_head:]):
+        # The first block's bits skip its shebang line, which would be
+        # words anywhere else.
+        if not start and mwot.startswith('#!', start + shift):
+            break
+        start += shift
+        end += shift
+        if (start < first_allowed or not mwot[start - 1].isspace()
+                or digest(mwot[start:end]) != block_digest):
+            break
+        n_tail += 1
+    tail = blocks[len(blocks) - n_tail:]
+    if tail:
+        tail_start, tail_bit = tail[0][0] + shift, tail[0][2]
+    else:
+        tail_start, tail_bit = len(mwot), len(cache.bits)
+
+    new_cache = _compile_span(
+        mwot, head_end, tail_start,
+        checkpoints=cache.checkpoints[:n_head],
+        bits=cache.bits[:head_bits],
+        tail_checkpoints=cache.checkpoints[len(blocks) - n_tail:],
+        tail_bits=cache.bits[tail_bit:],
+        interval=interval,
+    )
+    new_cache.output = cache.output
+
+    # The recompiled span may still match the old bits partway.
+    old_span = cache.bits[head_bits:tail_bit]
+    new_tail_bit = len(new_cache.bits) - (len(cache.bits) - tail_bit)
+    new_span = new_cache.bits[head_bits:new_tail_bit]
+    first_changed = head_bits
+    for old, new in zip(old_span, new_span):
+        if old != new:
+            break
+        first_changed += 1
+    else:
+        if len(old_span) == len(new_span):
+            first_changed = len(new_cache.bits)
+    return new_cache, first_changed
+
+
+def _compile_span(mwot, pos, endpos, checkpoints=(), bits=None,
+                  tail_checkpoints=(), tail_bits=b'',
+                  interval=default_interval):
+    """Compile `mwot[pos:endpos]` between already-compiled bits."""
+    checkpoints = list(checkpoints)
+    if bits is None:
+        bits = bytearray()
+    if not checkpoints or checkpoints[-1][0] != pos:
+        checkpoints.append((pos, len(bits)))
+    next_checkpoint = len(bits) + interval
+    start = shebang_end(mwot) if pos == 0 else pos
+    for offset, bit in located_bits(mwot, start, endpos):
+        if len(bits) >= next_checkpoint:
+            checkpoints.append((offset, len(bits)))
+            next_checkpoint = len(bits) + interval
+        bits.append(bit)
+
+    # Shift the reused tail to follow the new bits.
+    if tail_checkpoints:
+        shift = endpos - tail_checkpoints[0][0]
+        bit_shift = len(bits) - tail_checkpoints[0][1]
+        if checkpoints[-1][0] == endpos:
+            checkpoints.pop()
+        checkpoints.extend((offset + shift, bit + bit_shift)
+                           for offset, bit in tail_checkpoints)
+        bits += tail_bits
+
+    bounds = [offset for offset, _ in checkpoints[1:]] + [len(mwot)]
+    digests = [digest(mwot[start:end])
+               for (start, _), end in zip(checkpoints, bounds)]
+    return BitCache(len(mwot), bits, checkpoints, digests, interval)
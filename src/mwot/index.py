@@ -0,0 +1,105 @@
+"""Seekable indices for random access into compiled MWOT.
+
+An index records the byte offset in the UTF-8 source of the word that
+generates every `interval`th bit, so any span of bits can be compiled by
+seeking to the nearest checkpoint instead of starting from the top.
+"""
+
+from array import array
+import codecs
+import itertools
+import struct
+import sys
+
+from .compiler import bits_from_words, located_bits, shebang_end
+from .util import split
+
+magic = b'MWOTIDX\x01'
+header = struct.Struct('<QQQ')  # interval, bit count, source size
+default_interval = 4096
+read_size = 1 << 16
+
+
+class Index:
+    """Byte offsets of every `interval`th bit of a MWOT source."""
+
+    def __init__(self, interval, offsets, nbits, size):
+        self.interval = interval
+        self.offsets = offsets
+        self.nbits = nbits
+        self.size = size
+
+    @classmethod
+    def build(cls, source, interval=default_interval):
+        """Index UTF-8 MWOT, given as a bytes-like or binary file."""
+        if hasattr(source, 'read'):
+            source = source.read()
+        data = bytes(source)
+        mwot = data.decode()
+        ascii_only = len(mwot) == len(data)
+        offsets = array('Q')
+        nbits = 0
+        char_pos = byte_pos = 0
+        for offset, _ in located_bits(mwot, shebang_end(mwot)):
+            if not nbits % interval:
+                if ascii_only:
+                    byte_pos = offset
+                else:
+                    byte_pos += len(mwot[char_pos:offset].encode())
+                    char_pos = offset
+                offsets.append(byte_pos)
+            nbits += 1
+        return cls(interval, offsets, nbits, len(data))
+
+    @classmethod
+    def load(cls, f):
+        """Read an index from a binary file."""
+        if f.read(len(magic)) != magic:
+            raise ValueError('not a MWOT index')
+        interval, nbits, size = header.unpack(f.read(header.size))
+        offsets = array('Q')
+        offsets.frombytes(f.read())
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        return cls(interval, offsets, nbits, size)
+
+    def save(self, f):
+        """Write the index to a binary file."""
+        f.write(magic)
+        f.write(header.pack(self.interval, self.nbits, self.size))
+        offsets = array('Q', self.offsets)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        f.write(offsets.tobytes())
+
+
+def read_bits(source, index, start, stop=None):
+    """Yield bits `start` to `stop` of indexed MWOT.
+
+    `source` is the indexed UTF-8 source, as a bytes-like or a seekable
+    binary file. Only the source from the nearest checkpoint on is read.
+    """
+    stop = index.nbits if stop is None else min(stop, index.nbits)
+    if start >= stop:
+        return
+    checkpoint = start // index.interval
+    offset = index.offsets[checkpoint]
+    skip = start - checkpoint * index.interval
+    words = split(_chars_from(source, offset))
+    bits = bits_from_words(words)
+    yield from itertools.islice(bits, skip, skip + stop - start)
+
+
+def _chars_from(source, offset):
+    """Yield decoded text characters from a byte offset on."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    if hasattr(source, 'read'):
+        source.seek(offset)
+        blocks = iter(lambda: source.read(read_size), b'')
+    else:
+        view = memoryview(source)
+        blocks = (view[i:i + read_size]
+                  for i in range(offset, len(view), read_size))
+    for block in blocks:
+        yield from decoder.decode(block)
+    yield from decoder.decode(b'', final=True)
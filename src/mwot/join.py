@@ -1,6 +1,9 @@
 """The Joinable interface for collecting iterators."""
 
 from functools import wraps
+import itertools
+
+default_bufsize = 1 << 16
 
 
 class Joinable:
@@ -12,11 +15,13 @@ class Joinable:
         str: ''.join,
     }
 
-    def __init__(self, iterator, seq_type=None, function=None):
+    def __init__(self, iterator, seq_type=None, function=None,
+                 length_hint=None):
         self.iterator = iter(iterator)
         self.seq_type = seq_type
         self.collect = self._collectors.get(seq_type, seq_type)
         self.function = function
+        self.length_hint = length_hint
 
     def __iter__(self):
         return self
@@ -24,6 +29,11 @@ class Joinable:
     def __next__(self):
         return self.iterator.__next__()
 
+    def __length_hint__(self):
+        if self.length_hint is None:
+            return NotImplemented
+        return self.length_hint
+
     def __repr__(self):
         infos = ['joinable']
         if self.seq_type is not None:
@@ -35,21 +45,46 @@ class Joinable:
         info = ' '.join(infos)
         return f'<{info}>'
 
+    def blocks(self, bufsize=default_bufsize):
+        """Yield joined blocks of at most `bufsize` items each."""
+        while block := self.collect(itertools.islice(self.iterator, bufsize)):
+            yield block
+
     def join(self):
         """Return self, joined with the correct collector."""
+        if self.seq_type is bytes and self.length_hint:
+            # Fill a preallocated buffer instead of growing one.
+            buf = bytearray(self.length_hint)
+            end = 0
+            for block in self.blocks():
+                buf[end:end + len(block)] = block
+                end += len(block)
+            del buf[end:]
+            return bytes(buf)
         return self.collect(self.iterator)
 
+    def write_to(self, f, bufsize=default_bufsize):
+        """Write self to a file in blocks of `bufsize` items."""
+        if self.seq_type not in (str, bytes):
+            raise TypeError(f'cannot write joinable of {self.seq_type!r}')
+        for block in self.blocks(bufsize):
+            f.write(block)
 
-def joinable(seq_type=None):
+
+def joinable(seq_type=None, length_hint=None):
     """Decorator for iterable functions to add a collect option.
 
     `Joinable`'s `join()` interface unifies the joining functions for
     various types: `''.join()`, `bytes()`, `list()`.
+
+    `length_hint`, if given, is called with the function's arguments
+    and should return the output length or None if it's unknown.
     """
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
+            hint = length_hint(*args, **kwargs) if length_hint else None
             iterator = f(*args, **kwargs)
-            return Joinable(iterator, seq_type, function=f)
+            return Joinable(iterator, seq_type, function=f, length_hint=hint)
         return wrapper
     return decorator
@@ -7,13 +7,17 @@ Up to four different string-like types are recognized:
     4. Byte iterables
 The types are identified in the following ways, respectively:
     1. Instance of `str`
-    2. Instance of `bytes` or `bytearray`
+    2. Instance of `bytes`, `bytearray`, `memoryview` or `mmap.mmap`
     3. First item yielded is a single-character `str`
     4. First item yielded is an `int` in `range(256)`
 """
 
 import io
 import itertools
+import mmap
+
+# Byte strings that aren't `bytes`-like enough to iterate as ints
+buffer_types = (memoryview, mmap.mmap)
 
 
 def ask(s):
@@ -38,7 +42,7 @@ def decode(s):
     if stype is TEXT:
         return s
     if stype is BYTES:
-        return s.decode()
+        return str(s, 'utf-8')
     raise TypeError('cannot decode non-string')
 
 
@@ -52,6 +56,14 @@ def encode(s):
     raise TypeError('cannot encode non-string')
 
 
+def byte_view(s):
+    """View a byte string as a sequence of ints, without copying."""
+    if isinstance(s, buffer_types):
+        view = memoryview(s)
+        return view if view.format == 'B' else view.cast('B')
+    return s
+
+
 def StringIO(s):
     """Create an I/O object from a string."""
     stype = ask(s)
@@ -124,7 +136,7 @@ TEXT = SType(
 )
 # Byte strings
 BYTES = SType(
-    ask_fn=lambda s: isinstance(s, (bytes, bytearray)),
+    ask_fn=lambda s: isinstance(s, (bytes, bytearray, *buffer_types)),
     ask_char_fn=lambda c: isinstance(c, int) and c in range(256),
     buffer_fn=lambda textio: textio.buffer,
     convert_fn=encode,
@@ -141,7 +153,15 @@ def probe(s, default=TEXT):
     `s` will be partially exhausted.
 
     If `s` yields nothing, the returned `stype` will be `default`.
+
+    Whole strings are returned as they are, without iterating, except
+    that `memoryview`s and `mmap`s become `byte_view()`s.
     """
+    stype = ask(s)
+    if stype is BYTES:
+        return stype, byte_view(s)
+    if stype is not None:
+        return stype, s
     s = iter(s)
     try:
         first = next(s)
@@ -1,11 +1,16 @@
 """General functions, etc."""
 
 from collections import deque
+from functools import lru_cache
 import itertools
+import operator
+import re
 import warnings
 
 from . import stypes
 
+numpy_threshold = 1 << 16  # Input size at which NumPy is worth using
+
 
 def chunks(it, size):
     """Chop an iterable into chunks of length `size`.
@@ -22,14 +27,82 @@ def chunk_bits(bits, chunk_size):
     for chunk in chunks(bits, chunk_size):
         if len(chunk) < chunk_size:
             chunk += (0,) * (chunk_size - len(chunk))
-            message = (f'word count not divisible by {chunk_size}; trailing '
-                       f'zero(s) added')
-            warnings.warn(message, RuntimeWarning)
+            warn_padding(chunk_size)
         yield chunk
 
 
+def warn_padding(chunk_size):
+    """Warn that the last chunk of bits was padded with zeros."""
+    message = (f'word count not divisible by {chunk_size}; trailing zero(s) '
+               f'added')
+    warnings.warn(message, RuntimeWarning, stacklevel=2)
+
+
+def chunks_hint(it, chunk_size, scale=1):
+    """Estimate `chunk_bits(it, chunk_size)`'s length, times `scale`.
+
+    Returns None if the length of `it` isn't known.
+    """
+    length = operator.length_hint(it, -1)
+    if length < 0:
+        return None
+    return -(-length // chunk_size) * scale
+
+
+def numpy_backend(size):
+    """Get `mwot.vectorized` if NumPy is worth using on `size` items.
+
+    Returns None for inputs smaller than `numpy_threshold`, or if NumPy
+    isn't installed.
+    """
+    if size < numpy_threshold:
+        return None
+    return _load_vectorized()
+
+
+@lru_cache(maxsize=None)
+def _load_vectorized():
+    try:
+        from . import vectorized
+    except ImportError:
+        return None
+    return vectorized
+
+
 def deshebang(s, stype=None):
-    """Remove a leading shebang line."""
+    """Remove a leading shebang line.
+
+    Whole strings are sliced (see `deshebang_buffer()`); anything else
+    is iterated through.
+    """
+    if stypes.ask(s) is not None:
+        return deshebang_buffer(s)
+    return _deshebang_iter(s, stype)
+
+
+def deshebang_buffer(s):
+    """Slice a leading shebang line off a whole string.
+
+    `memoryview`s and `mmap`s are sliced as `stypes.byte_view()`s, so
+    nothing is copied.
+    """
+    stype = stypes.ask(s)
+    if stype is stypes.BYTES:
+        s = stypes.byte_view(s)
+    if s[:2] != stype.convert('#!'):
+        return s
+    if isinstance(s, memoryview):  # No find()
+        newline = _newline_pattern.search(s)
+        end = -1 if newline is None else newline.start()
+    else:
+        end = s.find(stype.convert('\n'))
+    return s[len(s):] if end < 0 else s[end + 1:]
+
+
+_newline_pattern = re.compile(b'\n')
+
+
+def _deshebang_iter(s, stype):
     if stype is None:
         stype, s = stypes.probe(s)
     else:
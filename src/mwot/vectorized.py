@@ -0,0 +1,93 @@
+"""NumPy versions of the compiler's hot loops, for large inputs.
+
+Importing this raises `ImportError` if NumPy isn't installed; use
+`util.numpy_backend()` to get it only if it's available.
+"""
+
+import numpy
+
+# Which ASCII characters satisfy `str.isalpha()` and `str.isspace()`
+_ascii_alpha = numpy.array([chr(i).isalpha() for i in range(128)])
+_ascii_space = numpy.array([chr(i).isspace() for i in range(128)])
+
+
+def char_codes(text):
+    """Get the code points of a `str` as an array.
+
+    ASCII text gets a `uint8` array; anything else, `uint32`. Lone
+    surrogates are kept, like the `str` methods in the compiler do.
+    """
+    if text.isascii():
+        return numpy.frombuffer(text.encode('ascii'), numpy.uint8)
+    data = text.encode('utf-32-le', 'surrogatepass')
+    return numpy.frombuffer(data, numpy.uint32)
+
+
+def char_masks(codes):
+    """Get masks of which code points are letters and whitespace.
+
+    These agree exactly with `str.isalpha()` and `str.isspace()`:
+    non-ASCII characters are looked up once per distinct character.
+    """
+    low = numpy.minimum(codes, 127)  # DEL is neither.
+    alpha = _ascii_alpha[low]
+    space = _ascii_space[low]
+    if codes.dtype != numpy.uint8:
+        high = numpy.flatnonzero(codes > 127)
+        if high.size:
+            distinct, inverse = numpy.unique(codes[high],
+                                             return_inverse=True)
+            chars = [chr(c) for c in distinct.tolist()]
+            alpha[high] = numpy.array([c.isalpha() for c in chars])[inverse]
+            space[high] = numpy.array([c.isspace() for c in chars])[inverse]
+    return alpha, space
+
+
+def bits_from_text(text, pos=0):
+    """Get the MWOT bits of `text[pos:]` as a `uint8` array.
+
+    Like `compiler.bits_from_mwot()`, but doesn't remove a shebang.
+    """
+    return bits_from_codes(char_codes(text[pos:]))
+
+
+def bits_from_utf8(data, pos=0):
+    """Like `bits_from_text()`, but for UTF-8 in a byte string.
+
+    ASCII is used as it is; anything else is decoded first.
+    """
+    codes = numpy.frombuffer(data, numpy.uint8)[pos:]
+    if codes.size and codes.max() > 127:
+        codes = char_codes(str(codes, 'utf-8'))
+    return bits_from_codes(codes)
+
+
+def bits_from_codes(codes):
+    """Get the MWOT bits of an array of code points."""
+    alpha, space = char_masks(codes)
+    # A word starts at each non-whitespace after whitespace (or at 0).
+    starts = numpy.flatnonzero(~space & numpy.insert(space[:-1], 0, True))
+    if not starts.size:
+        return numpy.zeros(0, numpy.uint8)
+    # Each word's span runs on to the next word, but that's only spaces.
+    counts = numpy.add.reduceat(alpha.astype(numpy.intp), starts)
+    return (counts[counts > 0] & 1).astype(numpy.uint8)
+
+
+def chunk_values(bits, chunk_size):
+    """Get the value of each `chunk_size` bits, as `bytes`.
+
+    `bits` is a byte string of 0s and 1s, whose length is a multiple
+    of `chunk_size` (at most 8). Bits are most significant first.
+    """
+    chunks = numpy.frombuffer(bits, numpy.uint8).reshape(-1, chunk_size)
+    weights = 1 << numpy.arange(chunk_size - 1, -1, -1, dtype=numpy.uint8)
+    return (chunks @ weights).astype(numpy.uint8).tobytes()
+
+
+def pack_bits(bits):
+    """Pack an array of bits into bytes, most significant bit first.
+
+    Like `binary.from_bits()`, a partial last byte is padded with 0s.
+    """
+    return numpy.packbits(numpy.asarray(bits, numpy.uint8)).tobytes()
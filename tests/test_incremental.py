@@ -0,0 +1,36 @@
+import random
+
+from mwot import incremental
+from mwot.compiler import bits_from_mwot
+
+
+def recompiled_bits(old, new, interval):
+    cache, _ = incremental.recompile(old, interval=interval)
+    cache, _ = incremental.recompile(new, cache, interval=interval)
+    return list(cache.bits)
+
+
+def test_insert_before_shebang():
+    old = '#! x1y ccchello   a\nccc  #!  #! #!\t'
+    new = 'ccc\nbb  wörld\ta x1y ' + old
+    assert recompiled_bits(old, new, 16) == bits_from_mwot(new).join()
+
+
+def test_edits_around_shebang():
+    rng = random.Random(28)
+    words = ['#!', 'a', 'bb', 'ccc', 'x1y', 'wörld', '\n', ' ', '\t']
+    for _ in range(3000):
+        old = ''.join(rng.choice(words) + rng.choice(' \n')
+                      for _ in range(rng.randrange(30)))
+        if rng.random() < 0.5:
+            old = '#!' + old
+        if rng.random() < 0.5:
+            start = rng.randrange(min(len(old), 8) + 1)
+        else:
+            start = rng.randrange(len(old) + 1)
+        end = start + rng.randrange(4)
+        insert = ''.join(rng.choice(words) for _ in range(rng.randrange(4)))
+        new = old[:start] + insert + old[end:]
+        interval = rng.choice([2, 4, 16])
+        assert recompiled_bits(old, new, interval) == (
+            bits_from_mwot(new).join()), (old, new, interval)
@@ -0,0 +1,23 @@
+import io
+
+from mwot.cli.pipeline import Reader, Writer
+
+
+def test_reader_close_stops_thread():
+    # The queue is full when the consumer stops early.
+    for _ in range(20):
+        reader = Reader(io.BytesIO(b'x' * 10_000), bufsize=10, depth=1)
+        next(reader)
+        reader.close()
+        reader._thread.join(5)
+        assert not reader._thread.is_alive()
+
+
+def test_round_trip():
+    data = bytes(range(256)) * 100
+    out = io.BytesIO()
+    with Reader(io.BytesIO(data), bufsize=7, depth=2) as reader:
+        with Writer(out, depth=2, bufsize=7) as writer:
+            while block := reader.read(5):
+                writer.write(block)
+    assert out.getvalue() == data
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from mwot import binary, compiler, util
+from mwot.brainfuck import interpreter
+
+vectorized = pytest.importorskip('mwot.vectorized')
+
+# Letters, marks, digits, punctuation and whitespace, ASCII or not
+alphabets = {
+    'ascii': 'etaoinshrdlu ETAOIN 0123 .,!? \t\n\x1c',
+    'unicode': 'etaoin éßΩπжя漢字 ́٣   　\x85 .,!?\n',
+    'surrogates': 'eta 𐏿\ud83d é漢 \n',
+}
+
+
+@pytest.fixture
+def both(monkeypatch):
+    """Call a function without and with NumPy: (python, numpy)."""
+    def call(func, *args):
+        results = []
+        for threshold in (float('inf'), 0):
+            monkeypatch.setattr(util, 'numpy_threshold', threshold)
+            results.append(func(*args))
+        return tuple(results)
+    return call
+
+
+def random_texts(alphabet, n=50):
+    rng = random.Random(40)
+    for _ in range(n):
+        text = ''.join(rng.choices(alphabet, k=rng.randrange(300)))
+        yield '#! shebang\n' + text if rng.random() < 0.2 else text
+
+
+def test_code_points():
+    text = ''.join(map(chr, range(0x110000)))
+    alpha, space = vectorized.char_masks(vectorized.char_codes(text))
+    assert alpha.tolist() == [c.isalpha() for c in text]
+    assert space.tolist() == [c.isspace() for c in text]
+
+
+@pytest.mark.parametrize('alphabet', alphabets)
+def test_bits_from_text(both, alphabet):
+    for text in random_texts(alphabets[alphabet]):
+        python, numpy = both(lambda: compiler.bits_from_mwot(text).join())
+        assert python == numpy, text
+        assert both(compiler.bit_bytes, text) == (bytes(python),) * 2
+        blocks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        assert both(lambda: compiler.bits_from_blocks(blocks).join()) == (
+            python, python), text
+
+
+@pytest.mark.parametrize('alphabet', ['ascii', 'unicode'])
+def test_bits_from_utf8(both, alphabet):
+    for text in random_texts(alphabets[alphabet]):
+        data = text.encode()
+        expected = compiler.bits_from_mwot(text).join()
+        python, numpy = both(lambda: compiler.bits_from_mwot(data).join())
+        assert python == numpy == expected, text
+        assert both(compiler.bit_bytes, data) == (bytes(expected),) * 2
+        # Blocks can split characters.
+        blocks = [data[i:i + 5] for i in range(0, len(data), 5)]
+        assert both(lambda: compiler.bits_from_blocks(blocks).join()) == (
+            expected, expected), text
+
+
+def test_lone_surrogates(both):
+    text = 'ab \ud800c d\udfff \ud83de'
+    assert both(lambda: compiler.bits_from_mwot(text).join()) == (
+        [0, 1, 1, 1], [0, 1, 1, 1])
+
+
+# Most lengths need padding.
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_from_bits(both):
+    rng = random.Random(40)
+    for _ in range(50):
+        bits = rng.choices([0, 1], k=rng.randrange(1000))
+        python, numpy = both(lambda: binary.from_bits(bits).join())
+        assert python == numpy
+        python, numpy = both(interpreter._code_from_bits, bytes(bits))
+        assert python == numpy